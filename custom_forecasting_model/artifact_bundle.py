@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.compile_forest import CompiledForest
+from custom_forecasting_model.linear_model import IncrementalLinearRegression, LinearBatch
+from custom_forecasting_model.prophet_lite import ProphetLite
+
+# --- Configuration ---
+BUNDLE_FORMAT = 'forecast-bundle'
+SCHEMA_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+COMPRESSED_FILE = 'arrays.npz'
+
+# A bundle is a directory: manifest.json describes the model (type, schema
+# version, indicator, country, training-data and fit fingerprints, metrics and
+# scalar parameters) and lists its arrays, which sit next to it as one .npy file each
+# (or together in arrays.npz when compressed). Reading the manifest touches no
+# array; uncompressed arrays are memory-mapped on first access, so loading is
+# constant time and processes serving the same bundle share its pages. The
+# manifest holds no timestamp, so rewriting a bundle from the same data and
+# model leaves every file byte-identical. Its version is a hash of the rest of
+# the manifest (which holds every array's SHA-256), so it names the content and
+# is the same in every clone and checkout.
+
+
+def data_fingerprint(years, values):
+    """SHA-256 of a training series, to tell whether a model was fitted on the data at hand."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(years, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def fit_fingerprint(years, values, model_type, config=None):
+    """
+    SHA-256 of a series sorted by year together with the model type and config it
+    is fitted with. A bundle holding the same fingerprint needs no refit.
+    """
+    order = np.argsort(np.asarray(years), kind='stable')
+    digest = hashlib.sha256(data_fingerprint(np.asarray(years)[order], np.asarray(values)[order]).encode('ascii'))
+    digest.update(json.dumps([model_type, config or {}], sort_keys=True, default=_json_default).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def bundle_fingerprint(bundle_dir):
+    """The fit fingerprint a bundle was saved with, or None when there is no readable bundle."""
+    try:
+        return read_manifest(bundle_dir).get('fit_fingerprint')
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_version(manifest):
+    """Content hash of a manifest, leaving out its own version."""
+    content = {key: value for key, value in manifest.items() if key != 'version'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=_json_default).encode('utf-8')).hexdigest()[:16]
+
+
+def _json_default(value):
+    # Metrics computed with NumPy arrive as NumPy scalars
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_bundle(bundle_dir, model_type, arrays=None, params=None, metrics=None, indicator=None, country=None,
+                 fingerprint=None, fit_fingerprint=None, compress=False):
+    """
+    Write a bundle, replacing any previous one at bundle_dir. params and metrics
+    must be JSON-serializable; arrays maps names to NumPy arrays. Returns the manifest.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in (arrays or {}).items()}
+    tmp_dir = f'{bundle_dir}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    if compress:
+        np.savez_compressed(os.path.join(tmp_dir, COMPRESSED_FILE), **arrays)
+    else:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), array)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'schema_version': SCHEMA_VERSION,
+        'model_type': model_type,
+        'indicator': indicator,
+        'country': country,
+        'data_fingerprint': fingerprint,
+        'fit_fingerprint': fit_fingerprint,
+        'metrics': metrics or {},
+        'params': params or {},
+        'compressed': compress,
+        'arrays': {
+            name: {
+                'file': COMPRESSED_FILE if compress else f'{name}.npy',
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'sha256': hashlib.sha256(array.tobytes()).hexdigest(),
+            }
+            for name, array in arrays.items()
+        },
+    }
+    manifest = {'version': manifest_version(manifest), **manifest}
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, default=_json_default)
+
+    # Readers never see a half-written bundle: the old directory is renamed aside, the finished one
+    # renamed into its place, and only then is the old one deleted, so bundle_dir is missing only
+    # between two renames rather than for the whole rmtree(), and open memory maps stay valid
+    old_dir = f'{bundle_dir}.old-{os.getpid()}'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(bundle_dir):
+        os.rename(bundle_dir, old_dir)
+    os.rename(tmp_dir, bundle_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(bundle_dir):
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"{bundle_dir} is not a {BUNDLE_FORMAT}.")
+    if manifest['schema_version'] > SCHEMA_VERSION:
+        raise ValueError(f"{bundle_dir} uses schema version {manifest['schema_version']}; "
+                         f"this code reads up to {SCHEMA_VERSION}.")
+    return manifest
+
+
+class Bundle:
+    """A bundle opened for reading: the manifest is parsed, arrays are loaded on first access."""
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = bundle_dir
+        self.manifest = read_manifest(bundle_dir)
+        self._arrays = {}
+        self._npz = None
+
+    @property
+    def model_type(self):
+        return self.manifest['model_type']
+
+    @property
+    def params(self):
+        return self.manifest['params']
+
+    @property
+    def metrics(self):
+        return self.manifest['metrics']
+
+    def __contains__(self, name):
+        return name in self.manifest['arrays']
+
+    def __getitem__(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            entry = self.manifest['arrays'][name]
+            if self.manifest['compressed']:
+                if self._npz is None:
+                    self._npz = np.load(os.path.join(self.bundle_dir, entry['file']))
+                array = self._npz[name]
+            else:
+                array = np.load(os.path.join(self.bundle_dir, entry['file']), mmap_mode='r')
+            self._arrays[name] = array
+        return array
+
+
+# --- Model types ---
+# Each model type converts its model to (arrays, params) and back.
+
+def _linear_to_bundle(model):
+    return {}, {'m': model.m, 'c': model.c, 'stats': model.to_dict()}
+
+
+def _linear_from_bundle(bundle):
+    return IncrementalLinearRegression.from_dict(bundle.params['stats'])
+
+
+
+def _linear_batch_to_bundle(batch):
+    return {'m': batch.m, 'c': batch.c}, {'keys': [list(key) for key in batch.keys]}
+
+
+def _linear_batch_from_bundle(bundle):
+    return LinearBatch(bundle.params['keys'], bundle['m'], bundle['c'])
+
+
+def _forest_to_bundle(compiled):
+    return {'thresholds': compiled.thresholds, 'values': compiled.values}, {}
+
+
+def _forest_from_bundle(bundle):
+    return CompiledForest(bundle['thresholds'], bundle['values'])
+
+
+def _prophet_to_bundle(artifact):
+    # Every array of the exported artifact becomes a bundle array; dates are stored as int64 nanoseconds
+    arrays = {key: value for key, value in artifact.items() if isinstance(value, np.ndarray)}
+    arrays['history_ds'] = artifact['history_ds'].astype('datetime64[ns]').astype(np.int64)
+    seasonalities = []
+    for season in artifact['seasonalities']:
+        arrays[f"beta_{season['name']}"] = season['beta']
+        seasonalities.append({key: value for key, value in season.items() if key != 'beta'})
+    params = {key: value for key, value in artifact.items() if key not in arrays and key != 'seasonalities'}
+    params['seasonalities'] = seasonalities
+    return arrays, params
+
+
+def _prophet_from_bundle(bundle):
+    artifact = dict(bundle.params)
+    for name in bundle.manifest['arrays']:
+        if not name.startswith('beta_'):
+            artifact[name] = bundle[name]
+    artifact['history_ds'] = np.asarray(bundle['history_ds']).astype('datetime64[ns]')
+    artifact['seasonalities'] = [
+        {**season, 'beta': bundle[f"beta_{season['name']}"]} for season in bundle.params['seasonalities']
+    ]
+    return ProphetLite(artifact)
+
+
+# model type -> (to arrays and params, from bundle); prophet takes prophet_lite's exported artifact
+MODEL_TYPES = {
+    'linear': (_linear_to_bundle, _linear_from_bundle),
+    'linear_batch': (_linear_batch_to_bundle, _linear_batch_from_bundle),  # Many series; the registry serves each row
+    'random_forest': (_forest_to_bundle, _forest_from_bundle),
+    'prophet': (_prophet_to_bundle, _prophet_from_bundle),
+}
+
+
+def save_model_bundle(bundle_dir, model_type, model, **kwargs):
+    """Write `model` as a bundle of the given type; kwargs go to write_bundle()."""
+    arrays, params = MODEL_TYPES[model_type][0](model)
+    return write_bundle(bundle_dir, model_type, arrays, params, **kwargs)
+
+
+def load_model_bundle(bundle_dir):
+    """(model ready to predict, Bundle). Arrays stay memory-mapped until the model uses them."""
+    bundle = Bundle(bundle_dir)
+    return MODEL_TYPES[bundle.model_type][1](bundle), bundle
@@ -0,0 +1,284 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.series_index import open_index
+from custom_forecasting_model.linear_model import rolling_origin
+from custom_forecasting_model.models import MODEL_COSTS, MODEL_FITTERS
+from custom_forecasting_model.registry import year_inputs
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+OUTPUT_DIR = './custom_forecasting_model/output'
+RESULTS_FILE = os.path.join(OUTPUT_DIR, 'backtest_results.csv')
+HORIZON = 5  # Years forecast from every origin, as many as the scripts' hold-out
+MIN_TRAIN = 10  # Points before the first origin
+STEP = 1  # Years between consecutive origins
+WINDOW = None  # None trains on everything before the origin (expanding); an int keeps that many points (sliding)
+MAX_FOLDS = None  # Keep only the latest origins; None keeps them all
+MAX_WORKERS = None  # None means one process per CPU
+FEATURE_MODELS = ('direct_lag',)  # Fitted on the feature store's lags instead of on Year
+ROLLING_MODELS = ('linear',)  # Updated from origin to origin in this process instead of refit per fold
+
+# Rolling-origin cross-validation: every origin splits a series into the points
+# before it (all of them, or the last WINDOW) and the HORIZON points from it on.
+# Each (model type, series, origin) fold is an independent fit, so folds of all
+# series run together on one process pool. Their forecasts land in a
+# (series x fold x horizon) array padded with NaN, and the metrics are computed
+# from it in one vectorized pass.
+#
+# Linear folds need no pool: rolling_origin() carries one model through all
+# origins of a series, adding each new point with an O(1) update (and dropping
+# the oldest for a sliding window), once per step of the horizon.
+#
+# direct_lag folds read their inputs from the feature store, whose fold() only
+# shows what is known at the origin. Step h of the horizon gets its own
+# least-squares line of the value on lag h + 1, the latest value of the series
+# the origin has seen.
+
+# Set once in every worker by _init_worker(), so jobs carry only their keys
+_INDEX = None
+_SOURCE = None
+
+
+def fold_origins(n_points, horizon=HORIZON, min_train=MIN_TRAIN, step=STEP, max_folds=MAX_FOLDS):
+    """Positions of the first test point of every fold; the last fold still has a full horizon."""
+    origins = np.arange(min_train, n_points - horizon + 1, step)
+    return origins[-max_folds:] if max_folds else origins
+
+
+def fold_train_slice(origin, window=WINDOW):
+    return slice(0 if window is None else max(0, origin - window), origin)
+
+
+def forecast_errors(actual, predicted, axis=None):
+    """
+    RMSE, MAE, MAPE (in %) and R² over `axis` of equally shaped arrays, ignoring
+    NaN (padding, or folds that failed). MAPE skips zero actuals; R² compares the
+    squared error with the spread of the actuals around their own mean.
+    """
+    actual = np.asarray(actual, dtype=float)
+    error = np.asarray(predicted, dtype=float) - actual
+    valid = ~np.isnan(error)
+    count = valid.sum(axis=axis)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sse = np.nansum(error ** 2, axis=axis)
+        rmse = np.sqrt(sse / count)
+        mae = np.nansum(np.abs(error), axis=axis) / count
+
+        nonzero = valid & (actual != 0)
+        ape = np.where(nonzero, np.abs(error) / np.abs(np.where(nonzero, actual, 1.0)), 0.0)
+        mape = 100 * ape.sum(axis=axis) / nonzero.sum(axis=axis)
+
+        actual_valid = np.where(valid, actual, np.nan)
+        mean = np.nanmean(actual_valid, axis=axis, keepdims=True) if axis is not None else np.nanmean(actual_valid)
+        sst = np.nansum((actual_valid - mean) ** 2, axis=axis)
+        r2 = np.where(sst > 0, 1 - sse / sst, np.nan)
+    return {'rmse': rmse, 'mae': mae, 'mape': mape, 'r2': r2, 'n': count}
+
+
+def feature_spec(horizon=HORIZON):
+    """Features of the FEATURE_MODELS: the value 1 to horizon years earlier."""
+    return {'lags': list(range(1, horizon + 1)), 'diffs': [], 'rolling': []}
+
+
+def fit_direct_lag(X_train, y_train, X_test, columns):
+    """Forecast of every test step h from a line fitted on lag_{h+1} over the training rows."""
+    predicted = np.full(len(X_test), np.nan)
+    for h in range(len(X_test)):
+        x = X_train[:, columns.index(f'lag_{h + 1}')]
+        valid = ~np.isnan(x) & ~np.isnan(y_train)
+        if valid.sum() < 2:
+            continue
+        design = np.column_stack([x[valid], np.ones(valid.sum())])
+        (m, c), *_ = np.linalg.lstsq(design, y_train[valid], rcond=None)
+        predicted[h] = m * X_test[h, columns.index(f'lag_{h + 1}')] + c
+    return predicted
+
+
+def run_rolling(years, values, origins, horizon=HORIZON, window=WINDOW, min_train=MIN_TRAIN):
+    """
+    run_fold() of the linear model for every origin of a series at once, from one
+    rolling_origin() pass per horizon step. Returns run_fold()'s tuple per origin.
+    """
+    start = time.perf_counter()
+    predicted = np.full((len(origins), horizon), np.nan)
+    actual = np.full((len(origins), horizon), np.nan)
+    if len(origins):
+        for h in range(1, horizon + 1):
+            # rolling_origin() forecasts from every origin from min_train on; keep the folds' ones
+            _, predictions, actuals = rolling_origin(years, values, min_train, window, h)
+            predicted[:, h - 1] = predictions[origins - min_train]
+            actual[:, h - 1] = actuals[origins - min_train]
+    seconds = (time.perf_counter() - start) / max(len(origins), 1)
+    return [(predicted[f], actual[f], seconds) for f in range(len(origins))]
+
+
+def run_feature_fold(job):
+    """run_fold() for a FEATURE_MODELS job, on the feature store's view of the fold."""
+    from custom_forecasting_model.feature_store import open_features
+
+    model_type, indicator, country, origin, horizon, window, params = job
+    features = open_features(feature_spec(horizon), *_SOURCE)
+    (X_train, y_train), (X_test, actual) = features.fold(indicator, country, origin, horizon, window)
+    start = time.perf_counter()
+    try:
+        predicted = fit_direct_lag(X_train, y_train, X_test, features.columns)
+    except Exception as e:
+        print(f"[failed] {model_type} / {country} / {indicator} at fold {origin}: {e}")
+        predicted = np.full(len(actual), np.nan)
+    return predicted, np.asarray(actual, dtype=float), time.perf_counter() - start
+
+
+def run_fold(job):
+    """
+    Fit one fold in a worker: (forecast for the horizon, actuals, seconds spent
+    fitting and predicting), with NaNs for the forecast when the fit fails.
+    """
+    model_type, indicator, country, origin, horizon, window, params = job
+    if model_type in FEATURE_MODELS:
+        return run_feature_fold(job)
+    years, values = _INDEX.series(indicator, country)
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    train = fold_train_slice(origin, window)
+    test_years, actual = years[origin:origin + horizon], values[origin:origin + horizon]
+    start = time.perf_counter()
+    try:
+        model = MODEL_FITTERS[model_type](years[train], values[train], **(params or {}))
+        predicted = np.asarray(model.predict(year_inputs(model_type, test_years)), dtype=float)
+    except Exception as e:
+        print(f"[failed] {model_type} / {country} / {indicator} at {years[origin]}: {e}")
+        predicted = np.full(len(actual), np.nan)
+    return predicted, actual, time.perf_counter() - start
+
+
+def _init_worker(store_dir, csv_file):
+    global _INDEX, _SOURCE
+    _INDEX = open_index(store_dir, csv_file)
+    _SOURCE = (store_dir, csv_file)
+
+
+def run_folds(jobs, store_dir=INPUT_STORE_DIR, csv_file=INPUT_FILE, max_workers=MAX_WORKERS):
+    """run_fold() for every job, in order; in this process when max_workers is 1."""
+    if max_workers == 1:
+        _init_worker(store_dir, csv_file)
+        return [run_fold(job) for job in jobs]
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(store_dir, csv_file)) as executor:
+        # Cheap folds travel in chunks, so IPC does not dominate a closed-form fit
+        chunksize = max(1, len(jobs) // (max_workers * 8))
+        return list(executor.map(run_fold, jobs, chunksize=chunksize))
+
+
+def backtest(indicators='all', model_types='all', countries=None, horizon=HORIZON, min_train=MIN_TRAIN, step=STEP,
+             window=WINDOW, max_folds=MAX_FOLDS, params=None, store_dir=INPUT_STORE_DIR, csv_file=INPUT_FILE,
+             max_workers=MAX_WORKERS, series=None):
+    """
+    Rolling-origin backtest of every requested (model type, series). params maps
+    a model type to its fitter's keyword arguments; series, when given, limits
+    the run to those (indicator, country) pairs. Returns one row per (model
+    type, indicator, country) with the number of folds, the metrics over all
+    folds and horizons and the mean seconds of one fold's fit, plus {model type: (keys, actual, predicted)} holding the
+    (series x fold x horizon) arrays.
+    """
+    model_types = list(MODEL_FITTERS) + list(FEATURE_MODELS) if model_types == 'all' else list(model_types)
+    unknown = set(model_types) - set(MODEL_FITTERS) - set(FEATURE_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown model types: {', '.join(sorted(unknown))}")
+    index = open_index(store_dir, csv_file)
+    series = None if series is None else set(series)
+    keys = [
+        (indicator, country) for indicator, country in index.keys()
+        if (indicators == 'all' or indicator in indicators) and (countries is None or country in countries)
+        and (series is None or (indicator, country) in series)
+    ]
+
+    jobs, slots, rolling_slots, rolling_outputs = [], [], [], []
+    for model_type in sorted(model_types, key=lambda m: MODEL_COSTS.get(m, 1), reverse=True):
+        for s, (indicator, country) in enumerate(keys):
+            years, values = index.series(indicator, country)
+            origins = fold_origins(len(years), horizon, min_train, step, max_folds)
+            if model_type in ROLLING_MODELS:
+                rolling_slots.extend((model_type, s, f) for f in range(len(origins)))
+                rolling_outputs.extend(run_rolling(np.asarray(years, dtype=np.int64), np.asarray(values, dtype=float),
+                                                   origins, horizon, window, min_train))
+                continue
+            for f, origin in enumerate(origins):
+                jobs.append((model_type, indicator, country, int(origin), horizon, window, (params or {}).get(model_type)))
+                slots.append((model_type, s, f))
+    print(f"{len(jobs) + len(rolling_slots)} folds over {len(keys)} series and {len(model_types)} model types.")
+    if set(model_types) & set(FEATURE_MODELS):
+        # Built here once, so the workers only memory-map it
+        from custom_forecasting_model.feature_store import open_features
+        open_features(feature_spec(horizon), store_dir, csv_file)
+
+    start = time.perf_counter()
+    outputs = run_folds(jobs, store_dir, csv_file, max_workers) + rolling_outputs
+    slots += rolling_slots
+    print(f"Backtested in {time.perf_counter() - start:.2f}s.")
+
+    n_folds = max([f + 1 for _, _, f in slots], default=0)
+    arrays = {
+        model_type: (np.full((len(keys), n_folds, horizon), np.nan), np.full((len(keys), n_folds, horizon), np.nan))
+        for model_type in model_types
+    }
+    seconds = {model_type: np.zeros(len(keys)) for model_type in model_types}
+    for (model_type, s, f), (predicted, actual, fit_seconds) in zip(slots, outputs):
+        actual_array, predicted_array = arrays[model_type]
+        actual_array[s, f, :len(actual)] = actual
+        predicted_array[s, f, :len(predicted)] = predicted
+        seconds[model_type][s] += fit_seconds
+
+    rows = []
+    for model_type, (actual, predicted) in arrays.items():
+        metrics = forecast_errors(actual, predicted, axis=(1, 2))
+        folds = (~np.isnan(actual).all(axis=2)).sum(axis=1)
+        rows.append(pd.DataFrame({
+            'model': model_type,
+            'indicator': [indicator for indicator, _ in keys],
+            'country': [country for _, country in keys],
+            'folds': folds,
+            **{name: values for name, values in metrics.items() if name != 'n'},
+            'fit_seconds': np.where(folds > 0, seconds[model_type] / np.maximum(folds, 1), np.nan),
+        }))
+    results = pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+    return results, {model_type: (keys, *arrays[model_type]) for model_type in model_types}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of the forecasting models.")
+    parser.add_argument('--indicators', nargs='+', default=['all'], help="Indicator names, or 'all'.")
+    parser.add_argument('--models', nargs='+', default=['all'], help=f"Model types ({', '.join([*MODEL_FITTERS, *FEATURE_MODELS])}), or 'all'.")
+    parser.add_argument('--countries', nargs='+', default=None, help="Country ISO3 codes; all countries when omitted.")
+    parser.add_argument('--horizon', type=int, default=HORIZON)
+    parser.add_argument('--min-train', type=int, default=MIN_TRAIN)
+    parser.add_argument('--step', type=int, default=STEP)
+    parser.add_argument('--window', type=int, default=WINDOW, help="Sliding window length; expanding when omitted.")
+    parser.add_argument('--max-folds', type=int, default=MAX_FOLDS)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Worker processes; one per CPU by default.")
+    args = parser.parse_args()
+
+    results, _ = backtest(
+        indicators='all' if args.indicators == ['all'] else args.indicators,
+        model_types='all' if args.models == ['all'] else args.models,
+        countries=args.countries,
+        horizon=args.horizon,
+        min_train=args.min_train,
+        step=args.step,
+        window=args.window,
+        max_folds=args.max_folds,
+        max_workers=args.workers,
+    )
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    results.to_csv(RESULTS_FILE, index=False)
+    print(results.groupby('model')[['rmse', 'mae', 'mape', 'r2']].median().to_string())
+    print(f"Results for {len(results)} (model, series) pairs saved to {RESULTS_FILE}")
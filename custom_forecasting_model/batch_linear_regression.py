@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import COUNTRY_COLUMN, load_long_store, store_exists
+from data_prep.prepare import prepare
+from custom_forecasting_model.artifact_bundle import write_bundle
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+DATA_SOURCE = 'store'  # 'prepare' rebuilds the data in memory from resources/ without touching data/
+OUTPUT_DIR = './custom_forecasting_model/output'
+MODEL_FILE = os.path.join(OUTPUT_DIR, 'linear_regression_batch.bundle')
+FORECAST_YEARS = 10
+MIN_DATA_POINTS_FOR_TEST = 5  # Same split as custom_linear_regression_forecast.py
+
+
+def series_matrix(df_long):
+    """
+    Scatter a long frame into a Series x Year matrix, NaN where a series has no
+    observation. Returns (keys as (indicator, country) tuples, years, values).
+    """
+    indicators = df_long['Indicator'].astype(str).to_numpy()
+    if COUNTRY_COLUMN in df_long.columns:
+        countries = df_long[COUNTRY_COLUMN].astype(str).to_numpy()
+    else:
+        countries = np.full(len(df_long), None, dtype=object)
+
+    series_codes, keys = pd.factorize(pd.MultiIndex.from_arrays([indicators, countries]), sort=True)
+    year_codes, years = pd.factorize(df_long['Year'].to_numpy(), sort=True)
+
+    values = np.full((len(keys), len(years)), np.nan)
+    values[series_codes, year_codes] = df_long['Value'].to_numpy(dtype=float)
+    return list(keys), years.astype(np.int64), values
+
+
+def fit_all(years, values, test_size=MIN_DATA_POINTS_FOR_TEST, forecast_years=FORECAST_YEARS):
+    """
+    Fit y = m * year + c for every row of a Series x Year matrix at once.
+
+    Like the single-series script, the last test_size observations of a series
+    are held out when it has at least twice that many; m and c are 0 when a
+    series has fewer than two training points or a single training year. Years
+    are shifted by the first year of the grid before the sums are taken, so
+    the normal equations stay well conditioned; c is shifted back afterwards.
+    """
+    observed = ~np.isnan(values)
+    n_observed = observed.sum(axis=1)
+
+    # Position of every observation counted from the end of its series (1 = last)
+    from_end = np.cumsum(observed[:, ::-1], axis=1)[:, ::-1]
+    test = observed & (from_end <= test_size) & (n_observed >= 2 * test_size)[:, None]
+    train = observed & ~test
+
+    x0 = years[0] if len(years) else 0
+    x = (years - x0).astype(float)
+    y = np.where(train, values, 0.0)
+    w = train.astype(float)
+
+    n = w.sum(axis=1)
+    sum_x = w @ x
+    sum_y = y.sum(axis=1)
+    sum_xy = y @ x
+    sum_x_sq = w @ (x * x)
+
+    denominator = n * sum_x_sq - sum_x ** 2
+    fitted = (n > 1) & (denominator != 0)
+    safe_denominator = np.where(fitted, denominator, 1.0)
+    safe_n = np.where(fitted, n, 1.0)
+    m = np.where(fitted, (n * sum_xy - sum_x * sum_y) / safe_denominator, 0.0)
+    c_shifted = (sum_y - m * sum_x) / safe_n
+    c = np.where(fitted, c_shifted - m * x0, 0.0)
+
+    # --- Test RMSE, NaN for series without a test set ---
+    predictions = m[:, None] * years[None, :] + c[:, None]
+    squared_errors = np.where(test, (predictions - np.where(test, values, 0.0)) ** 2, 0.0)
+    n_test = test.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse = np.sqrt(squared_errors.sum(axis=1) / n_test)
+
+    # --- Forecast the years after each series' last observation ---
+    last_year = np.where(observed, years[None, :], x0).max(axis=1, initial=x0)
+    future_years = last_year[:, None] + np.arange(1, forecast_years + 1)
+    forecast = m[:, None] * future_years + c[:, None]
+
+    return {
+        'm': m,
+        'c': c,
+        'n_train': n.astype(np.int64),
+        'n_test': n_test,
+        'rmse': rmse,
+        'last_year': last_year,
+        'future_years': future_years,
+        'forecast': forecast,
+    }
+
+
+def load_long():
+    if DATA_SOURCE == 'prepare':
+        return prepare()
+    if store_exists(INPUT_STORE_DIR):
+        return load_long_store(INPUT_STORE_DIR)
+    return pd.read_csv(INPUT_FILE)
+
+
+if __name__ == '__main__':
+    # --- Load and Prepare Data ---
+    print("Loading data for all indicators...")
+    try:
+        df_long = load_long()
+    except FileNotFoundError:
+        print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the data preparation scripts.")
+        exit()
+
+    keys, years, values = series_matrix(df_long)
+    print(f"Series x Year matrix: {values.shape[0]} series x {values.shape[1]} years")
+
+    # --- Model Training, Evaluation and Forecasting in one pass ---
+    print("\n--- Fitting linear regression for every series ---")
+    start = time.perf_counter()
+    results = fit_all(years, values)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Fitted {len(keys)} series in {elapsed_ms:.2f} ms.")
+
+    evaluated = ~np.isnan(results['rmse'])
+    print(f"Evaluated {int(evaluated.sum())} series on a test set; "
+          f"{int((results['n_train'] <= 1).sum())} had too little data to train.")
+
+    # --- Save the Models ---
+    print(f"\n--- Saving all models to {MODEL_FILE} ---")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Row i of every array belongs to keys[i]; the arrays are memory-mapped when the bundle is read
+    write_bundle(MODEL_FILE, 'linear_batch', {'years': years, **results}, params={'keys': [list(key) for key in keys]})
+    print("Models saved successfully.")
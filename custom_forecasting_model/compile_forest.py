@@ -0,0 +1,82 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+
+# --- Configuration ---
+OUTPUT_DIR = './custom_forecasting_model/output'
+MODEL_FILE = os.path.join(OUTPUT_DIR, 'random_forest_model.pkl')
+BUNDLE_FILE = os.path.join(OUTPUT_DIR, 'random_forest.bundle')
+
+# A forest on a single feature is a step function of it: every tree sends x left
+# when x <= threshold, so between two consecutive split thresholds of the whole
+# forest every tree lands in the same leaf. Compiling evaluates the forest once
+# per interval; serving is a searchsorted over the thresholds. The two arrays are
+# saved as a bundle (artifact_bundle.py), so only NumPy is needed to load and
+# serve the compiled form.
+
+
+class CompiledForest:
+    """
+    Step-function form of a single-feature forest: values[i] is the prediction for
+    every x with thresholds[i - 1] < x <= thresholds[i]. Queries are cast to float32
+    first, as scikit-learn's trees do, so predict() matches model.predict bit for bit.
+    """
+
+    n_features_in_ = 1
+
+    def __init__(self, thresholds, values):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float32).reshape(-1).astype(np.float64)
+        return self.values[np.searchsorted(self.thresholds, x, side='left')]
+
+
+def _representatives(thresholds):
+    """A float32 point inside every interval; intervals too narrow to hold one can never be queried."""
+    upper = thresholds.astype(np.float32)
+    # Largest float32 <= each threshold: the top of the interval it closes
+    upper = np.where(upper.astype(np.float64) > thresholds, np.nextafter(upper, np.float32(-np.inf)), upper)
+    # Smallest float32 above the last threshold, for the open interval after it
+    last = np.float32(thresholds[-1]) if len(thresholds) else np.float32(0)
+    if len(thresholds) and np.float64(last) <= thresholds[-1]:
+        last = np.nextafter(last, np.float32(np.inf))
+    return np.append(upper, last)
+
+
+def compile_forest(model):
+    """Compile a fitted single-feature RandomForestRegressor (or any sklearn tree ensemble) to a CompiledForest."""
+    if model.n_features_in_ != 1:
+        raise ValueError(f"Only single-feature forests can be compiled; this one has {model.n_features_in_} features.")
+    thresholds = np.unique(np.concatenate([
+        tree.tree_.threshold[tree.tree_.feature >= 0] for tree in model.estimators_
+    ] or [np.empty(0)]))
+    points = _representatives(thresholds)
+    # Evaluate with the forest itself, so every value is exactly what model.predict returns
+    return CompiledForest(thresholds, model.predict(points.reshape(-1, 1)))
+
+
+if __name__ == '__main__':
+    # Compile an already trained random_forest_model.pkl
+    print(f"Loading model from {MODEL_FILE}...")
+    try:
+        with open(MODEL_FILE, 'rb') as f:
+            model_data = pickle.load(f)
+    except FileNotFoundError:
+        print(f"Error: Model file not found at {MODEL_FILE}. Please run the training script first.")
+        sys.exit(1)
+
+    if isinstance(model_data, dict) and 'model' in model_data:
+        model, metrics = model_data['model'], model_data.get('metrics', {})
+    else:
+        model, metrics = model_data, {}
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from custom_forecasting_model.artifact_bundle import save_model_bundle
+
+    compiled = compile_forest(model)
+    save_model_bundle(BUNDLE_FILE, 'random_forest', compiled, metrics=metrics)
+    print(f"Compiled {len(compiled.thresholds)} thresholds into {BUNDLE_FILE}.")
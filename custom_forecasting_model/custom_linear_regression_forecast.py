@@ -1,32 +1,40 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
-import pickle
+import sys
 import math
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import load_indicator
+from data_prep.prepare import prepare_indicator
+from custom_forecasting_model.linear_model import IncrementalLinearRegression
+from custom_forecasting_model.artifact_bundle import data_fingerprint, save_model_bundle
+from custom_forecasting_model.models import trained_fingerprint
+
 # --- Configuration ---
 INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+DATA_SOURCE = 'store'  # 'prepare' rebuilds the data in memory from resources/ without touching data/
+COUNTRY = 'PHL'  # Country ISO3 code of the series to forecast
 INDICATOR_TO_FORECAST = 'Electric power consumption (kWh per capita)'
 OUTPUT_DIR = './custom_forecasting_model/output'
-MODEL_FILE = os.path.join(OUTPUT_DIR, 'linear_regression_model.pkl')
+MODEL_FILE = os.path.join(OUTPUT_DIR, 'linear_regression.bundle')  # Bundle directory read by predict.py and streamlit_app.py
 OUTPUT_PLOT_FILE = os.path.join(OUTPUT_DIR, 'custom_forecast_plot.png')
 FORECAST_YEARS = 10
 MIN_DATA_POINTS_FOR_TEST = 5 # Minimum number of data points to hold out for testing
 
 # --- Load and Prepare Data ---
-print(f"Loading data from {INPUT_FILE}...")
+print(f"Loading data for the indicator: {INDICATOR_TO_FORECAST}")
 try:
-    df_long = pd.read_csv(INPUT_FILE)
+    # Reads only this indicator's rows from the columnar store (sorted by Year), or filters the CSV if there is no store
+    if DATA_SOURCE == 'prepare':
+        df_indicator = prepare_indicator(INDICATOR_TO_FORECAST, COUNTRY)
+    else:
+        df_indicator = load_indicator(INDICATOR_TO_FORECAST, INPUT_STORE_DIR, INPUT_FILE, COUNTRY)
 except FileNotFoundError:
     print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the data preparation scripts.")
     exit()
 
-print("Filtering data for the indicator:", INDICATOR_TO_FORECAST)
-df_indicator = df_long[df_long['Indicator'] == INDICATOR_TO_FORECAST].copy()
-
-# Ensure data is sorted by year
-df_indicator.sort_values('Year', inplace=True)
-
 # --- Train-Test Split ---
 print("\n--- Splitting data into training and testing sets ---")
 if len(df_indicator) >= MIN_DATA_POINTS_FOR_TEST * 2: # Ensure there's enough data for a meaningful split
@@ -48,33 +56,18 @@ x_train = train_df['Year'].values
 y_train = train_df['Value'].values
 n_train = len(x_train)
 
-# Calculate sum of x, y, xy, x^2 for training data
-if n_train > 1:
-    sum_x_train = sum(x_train)
-    sum_y_train = sum(y_train)
-    sum_xy_train = sum(x_train * y_train)
-    sum_x_sq_train = sum(x_train**2)
-
-    # Calculate slope (m) and intercept (c)
-    try:
-        m = (n_train * sum_xy_train - sum_x_train * sum_y_train) / (n_train * sum_x_sq_train - sum_x_train**2)
-        c = (sum_y_train - m * sum_x_train) / n_train
-    except ZeroDivisionError:
-        print("Error: Cannot calculate linear regression, division by zero.")
-        m, c = 0, 0
-else:
+# Sufficient statistics: n, the means of x and y, and the centred sums of (x - x̄)^2 and (x - x̄)(y - ȳ)
+model = IncrementalLinearRegression.fit(x_train, y_train)
+if n_train <= 1:
     print("Not enough data to train the model.")
-    m, c = 0, 0
+elif not model.fitted:
+    print("Error: Cannot calculate linear regression, division by zero.")
 
+# Calculate slope (m) and intercept (c)
+m, c = model.m, model.c
 
-print(f"Training complete. Model parameters: slope (m) = {m}, intercept (c) = {c}")
 
-# --- Save the Model ---
-print(f"\n--- Saving model to {MODEL_FILE} ---")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-with open(MODEL_FILE, 'wb') as f:
-    pickle.dump({'m': m, 'c': c}, f)
-print("Model saved successfully.")
+print(f"Training complete. Model parameters: slope (m) = {m}, intercept (c) = {c}")
 
 # --- Evaluation on Test Set ---
 if not test_df.empty:
@@ -92,6 +85,22 @@ if not test_df.empty:
 else:
     print("\n--- Skipping evaluation: Not enough data for a test set ---")
     predictions = [] # for plotting
+    rmse = None
+
+# --- Save the Model ---
+print(f"\n--- Saving model to {MODEL_FILE} ---")
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+save_model_bundle(
+    MODEL_FILE, 'linear', model,
+    metrics={'rmse': rmse, 'test_data_available': not test_df.empty},
+    indicator=INDICATOR_TO_FORECAST,
+    country=COUNTRY,
+    fingerprint=data_fingerprint(df_indicator['Year'].values, df_indicator['Value'].values),
+    # The same fingerprint train.py records, so either one recognises the other's bundle as current
+    fit_fingerprint=trained_fingerprint(df_indicator['Year'].values, df_indicator['Value'].values, 'linear',
+                                        test_size=MIN_DATA_POINTS_FOR_TEST),
+)
+print("Model saved successfully.")
 
 # --- Forecasting ---
 print(f"\n--- Generating forecast for the next {FORECAST_YEARS} years ---")
@@ -1,35 +1,47 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
 import pickle
 import math
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import load_indicator
+from data_prep.prepare import prepare_indicator
+from custom_forecasting_model.compile_forest import compile_forest
+from custom_forecasting_model.artifact_bundle import bundle_fingerprint, data_fingerprint, save_model_bundle
+from custom_forecasting_model.models import trained_fingerprint
+
 # --- Configuration ---
 INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+DATA_SOURCE = 'store'  # 'prepare' rebuilds the data in memory from resources/ without touching data/
+COUNTRY = 'PHL'  # Country ISO3 code of the series to forecast
 INDICATOR_TO_FORECAST = 'Electric power consumption (kWh per capita)'
 OUTPUT_DIR = './custom_forecasting_model/output'
 MODEL_FILE = os.path.join(OUTPUT_DIR, 'random_forest_model.pkl')
+BUNDLE_FILE = os.path.join(OUTPUT_DIR, 'random_forest.bundle')  # Compiled step function served by random_forest_app.py
 OUTPUT_PLOT_FILE = os.path.join(OUTPUT_DIR, 'random_forest_forecast_plot.png')
 FORECAST_YEARS = 10
 MIN_DATA_POINTS_FOR_TEST = 5 # Minimum number of data points to hold out for testing
+MODEL_CONFIG = {'n_estimators': 100, 'random_state': 42, 'min_samples_split': 2, 'min_samples_leaf': 1}
+REUSE_UNCHANGED = True  # Keep the saved model when this series and MODEL_CONFIG are the same as when it was fitted
 
 # --- Load and Prepare Data ---
-print(f"Loading data from {INPUT_FILE}...")
+print(f"Loading data for the indicator: {INDICATOR_TO_FORECAST}")
 try:
-    df_long = pd.read_csv(INPUT_FILE)
+    # Reads only this indicator's rows from the columnar store (sorted by Year), or filters the CSV if there is no store
+    if DATA_SOURCE == 'prepare':
+        df_indicator = prepare_indicator(INDICATOR_TO_FORECAST, COUNTRY)
+    else:
+        df_indicator = load_indicator(INDICATOR_TO_FORECAST, INPUT_STORE_DIR, INPUT_FILE, COUNTRY)
 except FileNotFoundError:
     print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the data preparation scripts.")
     exit()
 
-print("Filtering data for the indicator:", INDICATOR_TO_FORECAST)
-df_indicator = df_long[df_long['Indicator'] == INDICATOR_TO_FORECAST].copy()
-
-# Ensure data is sorted by year
-df_indicator.sort_values('Year', inplace=True)
-
 # --- Train-Test Split ---
 print("\n--- Splitting data into training and testing sets ---")
 if len(df_indicator) >= MIN_DATA_POINTS_FOR_TEST * 2: # Ensure there's enough data for a meaningful split
@@ -51,14 +63,18 @@ print("\n--- Training Random Forest Regressor on the training set ---")
 X_train = train_df[['Year']].values
 y_train = train_df['Value'].values
 
-# Create and train the model
-model = RandomForestRegressor(
-    n_estimators=100,
-    random_state=42,
-    min_samples_split=2,
-    min_samples_leaf=1
-)
-model.fit(X_train, y_train)
+# Reuse the saved model when neither the series nor the config changed since it was fitted
+fingerprint = trained_fingerprint(df_indicator['Year'].values, df_indicator['Value'].values, 'random_forest', MODEL_CONFIG,
+                                  test_size=MIN_DATA_POINTS_FOR_TEST)
+reuse = REUSE_UNCHANGED and os.path.exists(MODEL_FILE) and bundle_fingerprint(BUNDLE_FILE) == fingerprint
+if reuse:
+    print("Series and config unchanged since the saved model was fitted; reusing it.")
+    with open(MODEL_FILE, 'rb') as f:
+        model = pickle.load(f)['model']
+else:
+    # Create and train the model
+    model = RandomForestRegressor(**MODEL_CONFIG)
+    model.fit(X_train, y_train)
 
 # Get feature importance
 feature_importance = model.feature_importances_[0]
@@ -111,10 +127,25 @@ model_data = {
     }
 }
 
-# Save the model and metrics
-with open(MODEL_FILE, 'wb') as f:
-    pickle.dump(model_data, f)
-print("Model and metrics saved successfully.")
+if reuse:
+    print("Model unchanged; keeping the saved model and bundle.")
+else:
+    # Save the model and metrics
+    with open(MODEL_FILE, 'wb') as f:
+        pickle.dump(model_data, f)
+    print("Model and metrics saved successfully.")
+
+    # Compile the forest to a sorted array of split thresholds and the prediction between each pair
+    compiled = compile_forest(model)
+    save_model_bundle(
+        BUNDLE_FILE, 'random_forest', compiled,
+        metrics=model_data['metrics'],
+        indicator=INDICATOR_TO_FORECAST,
+        country=COUNTRY,
+        fingerprint=data_fingerprint(df_indicator['Year'].values, df_indicator['Value'].values),
+        fit_fingerprint=fingerprint,
+    )
+    print(f"Compiled forest ({len(compiled.thresholds)} thresholds) saved to {BUNDLE_FILE}.")
 
 # --- Forecasting ---
 print(f"\n--- Generating forecast for the next {FORECAST_YEARS} years ---")
@@ -0,0 +1,134 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.series_index import open_index
+from custom_forecasting_model.artifact_bundle import load_model_bundle, read_manifest
+from custom_forecasting_model.forecast_cache import FORECAST_END_YEAR, model_fingerprint
+from custom_forecasting_model.registry import OUTPUT_DIR, ModelRegistry, year_inputs
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+FIRST_YEAR = 1960
+LAST_YEAR = FORECAST_END_YEAR
+DEFAULT_YEAR = 2030
+DEFAULT_INDICATOR = 'Electric power consumption (kWh per capita)'  # Selected first when it has a model
+MODEL_LABELS = {'linear': 'Linear Regression', 'random_forest': 'Random Forest', 'prophet': 'Prophet'}
+
+# One dashboard for every model the registry finds under OUTPUT_DIR. Widgets
+# rerun this script from the top, so everything expensive is cached by
+# Streamlit: the registry and each loaded bundle with st.cache_resource, and each
+# model's predictions for every year from FIRST_YEAR to LAST_YEAR with
+# st.cache_data. Bundles are loaded straight from disk rather than through the
+# registry's own cache, and both caches are keyed by the bundle's fingerprint,
+# so a retrained model is picked up and nothing else is ever loaded or
+# predicted twice. Changing
+# the year or the chart range only reads the cached table; the chart is drawn
+# in the browser from it.
+
+
+@st.cache_resource
+def get_registry(root=OUTPUT_DIR):
+    return ModelRegistry(root)
+
+
+@st.cache_resource
+def load_bundle(bundle_dir, fingerprint):
+    """The bundle's model, read from disk; fingerprint (of its manifest) is only part of the cache key."""
+    model, _ = load_model_bundle(bundle_dir)
+    return model
+
+
+@st.cache_data
+def forecast(bundle_dir, row, model_type, fingerprint, first_year=FIRST_YEAR, last_year=LAST_YEAR):
+    """Year and Forecast for every year of the range, plus Lower and Upper for models with intervals."""
+    model = load_bundle(bundle_dir, fingerprint)
+    if row is not None:
+        model = model.row(row)
+    years = np.arange(first_year, last_year + 1)
+    inputs = year_inputs(model_type, years)
+    if hasattr(model, 'predict_interval'):
+        yhat, lower, upper = model.predict_interval(inputs)
+        return pd.DataFrame({'Year': years, 'Forecast': yhat, 'Lower': lower, 'Upper': upper})
+    return pd.DataFrame({'Year': years, 'Forecast': np.asarray(model.predict(inputs), dtype=float)})
+
+
+@st.cache_data
+def history(indicator, country, data_fingerprint):
+    """The series' Year and Actual values; data_fingerprint (of the model's training data) keys the cache."""
+    try:
+        years, values = open_index(INPUT_STORE_DIR, INPUT_FILE).series(indicator, country)
+    except (KeyError, FileNotFoundError):
+        return pd.DataFrame({'Year': np.empty(0, dtype=int), 'Actual': np.empty(0)})
+    return pd.DataFrame({'Year': np.asarray(years, dtype=int), 'Actual': np.asarray(values, dtype=float)})
+
+
+# --- Streamlit App ---
+st.set_page_config(page_title="Energy Indicator Forecasts", layout="wide")
+st.title("Energy Indicator Forecasts")
+
+registry = get_registry()
+if st.sidebar.button("Rescan models", help="Pick up models trained since the dashboard started."):
+    registry.refresh()
+
+entries = list(registry.entries.values())
+if not entries:
+    st.info(f"No trained models found under {OUTPUT_DIR}. Please run a training script first.")
+    st.stop()
+
+# --- Choose a Series and Model ---
+indicators = sorted({entry.indicator for entry in entries if entry.indicator})
+indicator = st.sidebar.selectbox("Indicator", indicators,
+                                 index=indicators.index(DEFAULT_INDICATOR) if DEFAULT_INDICATOR in indicators else 0)
+countries = sorted({entry.country for entry in entries if entry.indicator == indicator}, key=str)
+country = st.sidebar.selectbox("Country", countries, format_func=lambda c: c or "-") if len(countries) > 1 \
+    else countries[0]
+model_types = sorted({e.model_type for e in entries if e.indicator == indicator and e.country == country},
+                     key=list(MODEL_LABELS).index)
+model_type = st.sidebar.selectbox("Model", model_types, format_func=lambda m: MODEL_LABELS.get(m, m))
+
+entry = registry.find(indicator, model_type, country)
+if not registry.is_current(entry):
+    # Retrained since the last scan
+    registry.refresh()
+    entry = registry.find(indicator, model_type, country)
+fingerprint = model_fingerprint(entry.bundle_dir)
+table = forecast(entry.bundle_dir, entry.row, model_type, fingerprint)
+actuals = history(indicator, country, read_manifest(entry.bundle_dir).get('data_fingerprint'))
+
+st.subheader(f"{indicator}{f' ({country})' if country else ''}")
+st.caption(f"{MODEL_LABELS.get(model_type, model_type)} model, version {entry.version}")
+
+# --- Model Evaluation Metrics ---
+shown = [(name, label) for name, label in [('rmse', 'RMSE'), ('mae', 'MAE'), ('r2', 'R² Score')]
+         if isinstance(entry.metrics.get(name), (int, float))]
+if shown:
+    for column, (name, label) in zip(st.columns(len(shown)), shown):
+        column.metric(label, f"{entry.metrics[name]:,.4f}" if name == 'r2' else f"{entry.metrics[name]:,.2f}")
+
+# --- Make a Prediction ---
+st.subheader("Make a Prediction")
+year = st.number_input("Year to predict:", min_value=FIRST_YEAR, max_value=LAST_YEAR, value=DEFAULT_YEAR, step=1)
+row = table.loc[table['Year'] == year].iloc[0]
+if 'Lower' in table.columns:
+    st.success(f"Predicted value for {year}: **{row['Forecast']:,.2f}** "
+               f"(interval {row['Lower']:,.2f} to {row['Upper']:,.2f})")
+else:
+    st.success(f"Predicted value for {year}: **{row['Forecast']:,.2f}**")
+
+# --- Forecast Visualization ---
+st.subheader("Forecast Visualization")
+last_actual = int(actuals['Year'].max()) if len(actuals) else DEFAULT_YEAR
+start, end = st.slider("Years shown", FIRST_YEAR, LAST_YEAR,
+                       (int(actuals['Year'].min()) if len(actuals) else FIRST_YEAR, min(LAST_YEAR, last_actual + 20)))
+chart = table.merge(actuals, on='Year', how='left')
+chart = chart[(chart['Year'] >= start) & (chart['Year'] <= end)]
+st.line_chart(chart.set_index('Year'))
+
+with st.expander("Forecast table"):
+    st.dataframe(chart.set_index('Year'), use_container_width=True)
@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import MANIFEST_FILE, store_exists
+from data_prep.series_index import open_index
+from custom_forecasting_model.artifact_bundle import Bundle, read_manifest, write_bundle
+from custom_forecasting_model.backtest import HORIZON, WINDOW, fold_train_slice
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+OUTPUT_DIR = './custom_forecasting_model/output'
+FEATURES_DIR = os.path.join(OUTPUT_DIR, 'features')  # One bundle per (data fingerprint, feature spec)
+ROLLING_STATS = ('mean', 'std', 'min', 'max')
+
+# Features built when no spec is given. Every feature of year t is computed from
+# years before t only, so a row is a valid input for forecasting its own year.
+DEFAULT_SPEC = {
+    'lags': [1, 2, 3],  # Value k years earlier
+    'diffs': [1],  # Change over k years, up to the year before
+    'rolling': [3, 5],  # Windows, ending the year before, summarised with each of rolling_stats
+    'rolling_stats': ['mean', 'std'],
+    'cross_indicators': [],  # Other indicators of the same country, or 'all'
+    'cross_lags': [1],  # Lags at which the cross indicators are taken
+}
+
+# The store scatters every series into one Series x Year matrix and computes each
+# feature for all series at once as a shifted, differenced or windowed copy of
+# it, stacked into a single (series x year x feature) array. That array is saved
+# as a bundle named after the fingerprint of the data and the spec, so it is
+# built once: later runs, and every worker of a pool, memory-map it and share its
+# pages, and repeat calls in a process return the same object. series() and
+# the training part of fold() hand out basic slices of it, which are views.
+# Test rows of a fold are copied instead, with every feature that reaches a
+# year from the origin on blanked out: a forecast made at the origin cannot
+# know those values.
+
+
+def normalize_spec(spec=None):
+    """The spec with every key filled in from DEFAULT_SPEC, in a canonical order for hashing."""
+    spec = {**DEFAULT_SPEC, **(spec or {})}
+    unknown = set(spec) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f"Unknown feature spec keys: {', '.join(sorted(unknown))}")
+    bad_stats = set(spec['rolling_stats']) - set(ROLLING_STATS)
+    if bad_stats:
+        raise ValueError(f"Unknown rolling stats: {', '.join(sorted(bad_stats))}")
+    for name in ['lags', 'diffs', 'rolling', 'cross_lags']:
+        if any(int(k) < 1 for k in spec[name]):
+            raise ValueError(f"{name} must be positive, or the feature of a year would include that year.")
+        spec[name] = sorted({int(k) for k in spec[name]})
+    if spec['cross_indicators'] != 'all':
+        spec['cross_indicators'] = sorted(set(spec['cross_indicators']))
+    spec['rolling_stats'] = [stat for stat in ROLLING_STATS if stat in spec['rolling_stats']]
+    return spec
+
+
+def spec_key(fingerprint, spec):
+    """Name of the cached feature set for this data and spec."""
+    payload = json.dumps([fingerprint, normalize_spec(spec)], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def index_matrix(index):
+    """
+    Scatter every series of a SeriesIndex into a Series x Year matrix, NaN where a
+    series has no observation. Returns (keys, years, values, fingerprint).
+    """
+    keys = sorted(index.keys(), key=str)
+    series = [index.series(*key) for key in keys]
+    all_years = np.unique(np.concatenate([years for years, _ in series])) if series else np.empty(0, np.int64)
+    values = np.full((len(keys), len(all_years)), np.nan)
+    for s, (years, series_values) in enumerate(series):
+        values[s, np.searchsorted(all_years, years)] = series_values
+
+    digest = hashlib.sha256(json.dumps(keys).encode('utf-8'))
+    digest.update(np.ascontiguousarray(all_years, dtype=np.int64).tobytes())
+    digest.update(values.tobytes())
+    return keys, all_years.astype(np.int64), values, digest.hexdigest()
+
+
+def _shift(values, k):
+    """values moved k years later along the year axis: column t holds year t - k."""
+    shifted = np.full_like(values, np.nan)
+    if k < values.shape[1]:
+        shifted[:, k:] = values[:, :values.shape[1] - k]
+    return shifted
+
+
+def _rolling(values, window, stat):
+    """stat over each window of `window` columns ending at column t; NaN until a full window, or where one is missing."""
+    out = np.full_like(values, np.nan)
+    if window <= values.shape[1]:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+        out[:, window - 1:] = getattr(np, stat)(windows, axis=2)
+    return out
+
+
+def build_features(keys, values, spec=None):
+    """
+    (series x year x feature) array and the feature names for a Series x Year
+    matrix, computed for all series at once.
+    """
+    spec = normalize_spec(spec)
+    columns, blocks = [], []
+    previous = _shift(values, 1)
+
+    for k in spec['lags']:
+        columns.append(f'lag_{k}')
+        blocks.append(previous if k == 1 else _shift(values, k))
+    for k in spec['diffs']:
+        columns.append(f'diff_{k}')
+        blocks.append(previous - _shift(values, 1 + k))
+    for window in spec['rolling']:
+        for stat in spec['rolling_stats']:
+            columns.append(f'rolling_{stat}_{window}')
+            blocks.append(_rolling(previous, window, stat))
+
+    if spec['cross_indicators']:
+        indicators = sorted({indicator for indicator, _ in keys}) if spec['cross_indicators'] == 'all' \
+            else spec['cross_indicators']
+        # Row of every (indicator, country); the extra all-NaN row stands in for series a country lacks
+        rows = {key: s for s, key in enumerate(keys)}
+        padded = np.vstack([values, np.full((1, values.shape[1]), np.nan)])
+        cross_rows = np.array([[rows.get((indicator, country), len(keys)) for indicator in indicators]
+                               for _, country in keys], dtype=np.intp).reshape(len(keys), len(indicators))
+        for k in spec['cross_lags']:
+            shifted = _shift(padded, k)
+            columns.extend(f'cross_lag_{k}:{indicator}' for indicator in indicators)
+            # (series x indicator x year) gathered in one step, then moved to the feature axis
+            blocks.extend(np.moveaxis(shifted[cross_rows], 1, 0))
+
+    features = np.stack(blocks, axis=2) if blocks else np.empty(values.shape + (0,))
+    return features, columns
+
+
+class FeatureSet:
+    """
+    Features of every series, as built by build_features(). `features` is
+    (series x year x feature) and `target` (series x year); `starts` and `stops`
+    bound each series' observed years, and `warmup` is how many of its first years
+    lack a full feature row.
+    """
+
+    def __init__(self, keys, years, target, features, columns, spec, fingerprint, starts, stops):
+        self.keys = keys
+        self.years = years
+        self.target = target
+        self.features = features
+        self.columns = columns
+        self.spec = spec
+        self.fingerprint = fingerprint
+        self.starts = starts
+        self.stops = stops
+        self.rows = {key: s for s, key in enumerate(keys)}
+        countries = {country for _, country in keys}
+        # With a single country, series() and fold() need not be told which, as with SeriesIndex
+        self.default_country = countries.pop() if len(countries) == 1 else None
+        lags = spec['lags'] + [1 + k for k in spec['diffs']] + spec['rolling'] + spec['cross_lags']
+        self.warmup = max(lags, default=0)
+        # Years between each feature's latest input and the year it is for: k for a lag of k, 1 for the rest
+        self.reach = np.array([int(column.split(':', 1)[0].rsplit('_', 1)[1]) if column.startswith(('lag_', 'cross_lag_'))
+                               else 1 for column in columns], dtype=np.int64)
+
+    @classmethod
+    def from_bundle(cls, bundle_dir):
+        bundle = Bundle(bundle_dir)
+        params = bundle.params
+        return cls([tuple(key) for key in params['keys']], bundle['years'], bundle['target'], bundle['features'],
+                   params['columns'], params['spec'], bundle.manifest['data_fingerprint'],
+                   bundle['starts'], bundle['stops'])
+
+    def save(self, bundle_dir):
+        write_bundle(
+            bundle_dir, 'feature_matrix',
+            arrays={'years': self.years, 'target': self.target, 'features': self.features,
+                    'starts': self.starts, 'stops': self.stops},
+            params={'keys': self.keys, 'columns': self.columns, 'spec': self.spec},
+            fingerprint=self.fingerprint,
+        )
+
+    def _row(self, indicator, country):
+        return self.rows[(indicator, country if country is not None else self.default_country)]
+
+    def series(self, indicator, country=None, skip_warmup=True):
+        """
+        (years, X, y) of one series over its observed years, as views. With
+        skip_warmup, the first years whose lags reach before the series are left out.
+        """
+        s = self._row(indicator, country)
+        start = int(self.starts[s]) + (self.warmup if skip_warmup else 0)
+        rows = slice(min(start, int(self.stops[s])), int(self.stops[s]))
+        return self.years[rows], self.features[s, rows], self.target[s, rows]
+
+    def fold(self, indicator, country, origin, horizon=HORIZON, window=WINDOW):
+        """
+        ((X_train, y_train), (X_test, y_test)) for a backtest fold, with origin
+        counted in points of the series as in backtest.fold_origins(). Warm-up
+        years are dropped from the training part, which is a view. X_test is a
+        copy holding only what is known at the origin: step h (0 for the origin's
+        own year) keeps the features whose reach is more than h, and the rest are NaN.
+        """
+        s = self._row(indicator, country)
+        start, stop = int(self.starts[s]), int(self.stops[s])
+        train = fold_train_slice(origin, window)
+        train_rows = slice(start + max(train.start, self.warmup), start + train.stop)
+        test_rows = slice(start + origin, min(start + origin + horizon, stop))
+        X_test = self.features[s, test_rows].copy()
+        X_test[self.reach[None, :] <= np.arange(len(X_test))[:, None]] = np.nan
+        return ((self.features[s, train_rows], self.target[s, train_rows]),
+                (X_test, self.target[s, test_rows]))
+
+
+# Feature sets already opened in this process, by (data source, its mtime and size, spec)
+_OPEN_FEATURES = {}
+
+
+def _source_key(store_dir, csv_file):
+    """What open_index() would read, with its mtime and size: cheap to get, and changes whenever the data does."""
+    source = os.path.join(store_dir, MANIFEST_FILE) if store_exists(store_dir) else csv_file
+    stat = os.stat(source)
+    return os.path.abspath(source), stat.st_mtime_ns, stat.st_size
+
+
+def open_features(spec=None, store_dir=INPUT_STORE_DIR, csv_file=INPUT_FILE, features_dir=FEATURES_DIR):
+    """
+    The FeatureSet for the current data and this spec: from memory when this
+    process already has it, else memory-mapped from its bundle, else built and
+    saved. A change to the data changes the fingerprint, so stale sets are never read.
+    """
+    spec = normalize_spec(spec)
+    # Checked before the matrix is built and hashed, so a repeat call costs one stat()
+    memory_key = (*_source_key(store_dir, csv_file), json.dumps(spec, sort_keys=True), os.path.abspath(features_dir))
+    cached = _OPEN_FEATURES.get(memory_key)
+    if cached is not None:
+        return cached
+
+    keys, years, values, fingerprint = index_matrix(open_index(store_dir, csv_file))
+    bundle_dir = os.path.join(features_dir, f'{spec_key(fingerprint, spec)}.bundle')
+    try:
+        if read_manifest(bundle_dir)['data_fingerprint'] == fingerprint:
+            _OPEN_FEATURES[memory_key] = FeatureSet.from_bundle(bundle_dir)
+            return _OPEN_FEATURES[memory_key]
+    except (OSError, ValueError):
+        pass
+
+    observed = ~np.isnan(values)
+    starts = np.where(observed.any(axis=1), observed.argmax(axis=1), 0)
+    stops = np.where(observed.any(axis=1), values.shape[1] - observed[:, ::-1].argmax(axis=1), 0)
+    features, columns = build_features(keys, values, spec)
+    os.makedirs(features_dir, exist_ok=True)
+    FeatureSet(keys, years, values, features, columns, spec, fingerprint, starts, stops).save(bundle_dir)
+    # Reopen from disk, so this process serves the same memory-mapped pages as every other
+    _OPEN_FEATURES[memory_key] = FeatureSet.from_bundle(bundle_dir)
+    return _OPEN_FEATURES[memory_key]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build (or reuse) the cached feature set for a feature spec.")
+    parser.add_argument('--spec', default=None, help="Feature spec as JSON; DEFAULT_SPEC when omitted.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    feature_set = open_features(json.loads(args.spec) if args.spec else None)
+    print(f"{feature_set.features.shape[0]} series x {feature_set.features.shape[1]} years x "
+          f"{feature_set.features.shape[2]} features in {time.perf_counter() - start:.2f}s")
+    print(f"Features: {', '.join(feature_set.columns[:12])}{' ...' if len(feature_set.columns) > 12 else ''}")
+    print(f"Cached under {FEATURES_DIR} as {spec_key(feature_set.fingerprint, feature_set.spec)}.bundle")
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.artifact_bundle import MANIFEST_FILE, Bundle, load_model_bundle, write_bundle
+
+# --- Configuration ---
+OUTPUT_DIR = './custom_forecasting_model/output'
+MODEL_BUNDLE = os.path.join(OUTPUT_DIR, 'prophet.bundle')
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'prophet_forecast.bundle')
+FORECAST_END_YEAR = 2100  # The last year prophet_app.py lets users ask for
+
+# The forecast table is computed once at training time for every year the app can
+# show and stored with the fingerprint of the model it came from. A table whose
+# fingerprint does not match the current model file is stale and is ignored.
+# The table is itself a bundle, so the app memory-maps its columns.
+
+
+def model_fingerprint(model_file=MODEL_BUNDLE):
+    """SHA-256 of the model file's bytes; for a bundle, of its manifest, which records every array's hash."""
+    if os.path.isdir(model_file):
+        model_file = os.path.join(model_file, MANIFEST_FILE)
+    with open(model_file, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_forecast_table(model, end_year=FORECAST_END_YEAR):
+    """ds, y (history only), yhat, yhat_lower and yhat_upper from the history through end_year."""
+    ds = np.concatenate([model.history_ds, model.future_dates(max(0, end_year - model.last_history_year + 1))])
+    ds = ds[ds.astype('datetime64[Y]').astype(int) + 1970 <= end_year]
+    yhat, yhat_lower, yhat_upper = model.predict_interval(ds)
+    return pd.DataFrame({
+        'ds': ds,
+        'y': np.concatenate([model.history_y, np.full(len(ds) - len(model.history_y), np.nan)]),
+        'yhat': yhat,
+        'yhat_lower': yhat_lower,
+        'yhat_upper': yhat_upper,
+    })
+
+
+def save_forecast_table(table, fingerprint, cache_file=CACHE_FILE):
+    arrays = {column: table[column].to_numpy(dtype=float) for column in ['y', 'yhat', 'yhat_lower', 'yhat_upper']}
+    arrays['ds'] = table['ds'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    write_bundle(cache_file, 'forecast_table', arrays, params={'model_fingerprint': fingerprint})
+
+
+def load_forecast_table(fingerprint, cache_file=CACHE_FILE):
+    """The cached table if it was built from the model with this fingerprint, else None."""
+    if not os.path.isdir(cache_file):
+        return None
+    cached = Bundle(cache_file)
+    if cached.params.get('model_fingerprint') != fingerprint:
+        return None
+    table = pd.DataFrame({column: cached[column] for column in ['y', 'yhat', 'yhat_lower', 'yhat_upper']})
+    table.insert(0, 'ds', np.asarray(cached['ds']).astype('datetime64[ns]'))
+    return table
+
+
+if __name__ == '__main__':
+    # Rebuild the cache for the current prophet.bundle
+    model, _ = load_model_bundle(MODEL_BUNDLE)
+    table = build_forecast_table(model)
+    save_forecast_table(table, model_fingerprint(MODEL_BUNDLE))
+    print(f"Cached {len(table)} forecast rows through {FORECAST_END_YEAR} in {CACHE_FILE}.")
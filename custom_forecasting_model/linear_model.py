@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class IncrementalLinearRegression:
+    """
+    y = m * x + c fitted from running sufficient statistics: the count, the means
+    of x and y, and the centred co-moments Σ(x - x̄)² and Σ(x - x̄)(y - ȳ).
+    Centring keeps the sums small for years around 2000, where Σx² and Σx·y
+    lose precision. update() and remove() adjust them in O(1) (Welford's
+    method), so a model can be extended with a new year or slid along a window
+    without revisiting the rest of the series.
+    """
+
+    def __init__(self, n=0, mean_x=0.0, mean_y=0.0, co_xx=0.0, co_xy=0.0):
+        self.n = int(n)
+        self.mean_x = float(mean_x)
+        self.mean_y = float(mean_y)
+        self.co_xx = float(co_xx)
+        self.co_xy = float(co_xy)
+
+    @classmethod
+    def fit(cls, x, y):
+        """Statistics of a whole series in two vectorized passes."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(x) == 0:
+            return cls()
+        mean_x, mean_y = x.mean(), y.mean()
+        dx = x - mean_x
+        return cls(len(x), mean_x, mean_y, dx @ dx, dx @ (y - mean_y))
+
+    def update(self, x, y):
+        """Add one observation."""
+        self.n += 1
+        dx = x - self.mean_x
+        self.mean_x += dx / self.n
+        self.mean_y += (y - self.mean_y) / self.n
+        self.co_xx += dx * (x - self.mean_x)
+        self.co_xy += dx * (y - self.mean_y)
+        return self
+
+    def remove(self, x, y):
+        """Take back an observation previously added; the inverse of update()."""
+        if self.n <= 1:
+            self.n, self.mean_x, self.mean_y, self.co_xx, self.co_xy = 0, 0.0, 0.0, 0.0, 0.0
+            return self
+        n = self.n - 1
+        mean_x = (self.n * self.mean_x - x) / n
+        mean_y = (self.n * self.mean_y - y) / n
+        self.co_xx -= (x - mean_x) * (x - self.mean_x)
+        self.co_xy -= (x - mean_x) * (y - self.mean_y)
+        self.n, self.mean_x, self.mean_y = n, mean_x, mean_y
+        return self
+
+    @property
+    def fitted(self):
+        return self.n > 1 and self.co_xx > 0
+
+    @property
+    def m(self):
+        return self.co_xy / self.co_xx if self.fitted else 0.0
+
+    @property
+    def c(self):
+        # Unfitted models predict 0, as custom_linear_regression_forecast.py always has
+        return self.mean_y - self.m * self.mean_x if self.fitted else 0.0
+
+    def predict(self, x):
+        return self.m * np.asarray(x, dtype=float) + self.c
+
+    def to_dict(self):
+        return {'n': self.n, 'mean_x': self.mean_x, 'mean_y': self.mean_y, 'co_xx': self.co_xx, 'co_xy': self.co_xy}
+
+    @classmethod
+    def from_dict(cls, stats):
+        return cls(**stats)
+
+
+class LinearRow:
+    """One series of a LinearBatch, with the same predict() as IncrementalLinearRegression."""
+
+    def __init__(self, m, c):
+        self.m = float(m)
+        self.c = float(c)
+
+    def predict(self, x):
+        return self.m * np.asarray(x, dtype=float) + self.c
+
+
+class LinearBatch:
+    """The y = m * x + c fits of many series, row i belonging to keys[i], as batch_linear_regression.py writes them."""
+
+    def __init__(self, keys, m, c):
+        self.keys = [tuple(key) for key in keys]
+        self.m = m
+        self.c = c
+
+    def row(self, i):
+        return LinearRow(self.m[i], self.c[i])
+
+
+def rolling_origin(x, y, min_train=2, window=None, horizon=1):
+    """
+    One forecast per origin: for every split point k >= min_train, fit on the
+    observations before k (only the last `window` of them when set) and predict
+    the one `horizon` steps after the origin. The model is updated and trimmed in
+    place between origins, so the whole evaluation costs O(len(x)).
+    Returns (origin positions, predictions, actuals).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    start = 0 if window is None else max(0, min_train - window)
+    model = IncrementalLinearRegression.fit(x[start:min_train], y[start:min_train])
+    origins, predictions = [], []
+    for k in range(min_train, len(x) - horizon + 1):
+        origins.append(k)
+        predictions.append(model.predict(x[k + horizon - 1]))
+        model.update(x[k], y[k])
+        if window is not None and model.n > window:
+            model.remove(x[k - window], y[k - window])
+
+    origins = np.asarray(origins, dtype=int)
+    return origins, np.asarray(predictions, dtype=float), y[origins + horizon - 1]
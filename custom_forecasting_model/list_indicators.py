@@ -1,14 +1,18 @@
-import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.series_index import open_index
 
 INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
 OUTPUT_DIR = './custom_forecasting_model/output'
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'INDICATORS.md')
 
 try:
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    df = pd.read_csv(INPUT_FILE)
-    unique_indicators = df['Indicator'].unique()
+    # The index keeps the sorted indicator names, so no rows are scanned
+    unique_indicators = open_index(INPUT_STORE_DIR, INPUT_FILE).indicators
 
     with open(OUTPUT_FILE, 'w') as f:
         f.write("# Unique Indicators in the Dataset\n\n")
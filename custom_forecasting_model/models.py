@@ -0,0 +1,197 @@
+import inspect
+import math
+
+import numpy as np
+import pandas as pd
+
+from custom_forecasting_model.artifact_bundle import (SCHEMA_VERSION, data_fingerprint, fit_fingerprint, load_model_bundle,
+                                                      save_model_bundle)
+from custom_forecasting_model.linear_model import IncrementalLinearRegression
+
+# --- Configuration ---
+MIN_DATA_POINTS_FOR_TEST = 5  # Same split as the single-series training scripts
+FIT_VERSION = 1  # Bump when a trainer changes what it fits or saves, so every saved bundle is refit
+
+# Each trainer fits one series the way its standalone script does (or with the
+# hyperparameters in params) and saves the result as the bundle that script
+# writes, so predict.py and the apps can load it. The heavy libraries are
+# imported inside the trainers: a worker only pays for the ones its jobs use.
+
+
+def split(years, values, test_size=MIN_DATA_POINTS_FOR_TEST):
+    """Hold out the last test_size points when there are at least twice as many; else train on everything."""
+    if len(years) >= test_size * 2:
+        return (years[:-test_size], values[:-test_size]), (years[-test_size:], values[-test_size:])
+    return (years, values), (years[:0], values[:0])
+
+
+def fit_config(model_type, params=None, test_size=MIN_DATA_POINTS_FOR_TEST):
+    """
+    Everything a trainer's fit depends on besides the series: its fitter's
+    defaults overridden by params, the split, FIT_VERSION and the bundle schema.
+    """
+    signature = inspect.signature(TRAINER_FITTERS[model_type])
+    defaults = {name: p.default for name, p in signature.parameters.items()
+                if p.default is not p.empty and name != 'previous'}
+    return {**defaults, **(params or {}), 'test_size': test_size, 'fit_version': FIT_VERSION,
+            'schema_version': SCHEMA_VERSION}
+
+
+def trained_fingerprint(years, values, model_type, params=None, test_size=MIN_DATA_POINTS_FOR_TEST):
+    """
+    The fit fingerprint of this series, model type and params. Every writer of a
+    model bundle (the trainers here and the single-series scripts) records this
+    one, so a bundle from either is recognised as current by the other.
+    """
+    return fit_fingerprint(years, values, model_type, fit_config(model_type, params, test_size))
+
+
+def _save(model_file, model_type, model, years, values, metrics, indicator, country, params):
+    save_model_bundle(model_file, model_type, model, metrics=metrics, indicator=indicator, country=country,
+                      fingerprint=data_fingerprint(years, values),
+                      fit_fingerprint=trained_fingerprint(years, values, model_type, params))
+
+
+def errors(actual, predicted):
+    """RMSE and MAE, or None for both when there is no test set."""
+    if len(actual) == 0:
+        return {'rmse': None, 'mae': None}
+    residuals = np.asarray(predicted, dtype=float) - np.asarray(actual, dtype=float)
+    return {'rmse': math.sqrt(float(np.mean(residuals ** 2))), 'mae': float(np.mean(np.abs(residuals)))}
+
+
+# --- Fitters: one series in, a model with predict() out ---
+# Keyword arguments are the hyperparameters; the defaults are the scripts' literals.
+
+def fit_linear(years, values):
+    return IncrementalLinearRegression.fit(years, values)
+
+
+def fit_random_forest(years, values, n_estimators=100, min_samples_split=2, min_samples_leaf=1, random_state=42):
+    """A RandomForestRegressor on Year alone, compiled to its step function (same predictions, NumPy only)."""
+    from sklearn.ensemble import RandomForestRegressor
+    from custom_forecasting_model.compile_forest import compile_forest
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state,
+                                  min_samples_split=min_samples_split, min_samples_leaf=min_samples_leaf)
+    model.fit(np.asarray(years).reshape(-1, 1), values)
+    return compile_forest(model)
+
+
+def _fit_prophet(years, values, changepoint_prior_scale=0.2, previous=None, yearly_seasonality=False,
+                 weekly_seasonality=False, daily_seasonality=False):
+    """(fitted trend-only Prophet, fit statistics), seeded from `previous` when it can be."""
+    from prophet import Prophet
+    from custom_forecasting_model.prophet_warm_start import fit_prophet
+
+    df_prophet = pd.DataFrame({'ds': pd.to_datetime(np.asarray(years).astype(str), format='%Y'), 'y': values})
+    model = Prophet(
+        yearly_seasonality=yearly_seasonality,
+        weekly_seasonality=weekly_seasonality,
+        daily_seasonality=daily_seasonality,
+        changepoint_prior_scale=changepoint_prior_scale,
+    )
+    return model, fit_prophet(model, df_prophet, previous)
+
+
+def fit_prophet_lite(years, values, changepoint_prior_scale=0.2):
+    """A trend-only Prophet fit, exported to ProphetLite so predictions skip Prophet's sampling."""
+    from custom_forecasting_model.prophet_lite import ProphetLite, export_prophet
+
+    model, _ = _fit_prophet(years, values, changepoint_prior_scale)
+    return ProphetLite(export_prophet(model))
+
+
+def extend_linear(model_file, years, values, x_train, y_train, params=None):
+    """
+    The linear model saved at model_file, brought up to this training split with
+    update(), when it was fitted with the current config on the first years of
+    this series (the series has only gained years since); else None.
+    """
+    try:
+        model, bundle = load_model_bundle(model_file)
+    except (OSError, ValueError, KeyError):
+        return None
+    if bundle.model_type != 'linear' or model.n > len(x_train):
+        return None
+    # The earlier series had model.n training points, plus a test split if it was long enough for one
+    for n_old in {model.n, model.n + MIN_DATA_POINTS_FOR_TEST}:
+        if n_old <= len(years) and len(split(years[:n_old], values[:n_old])[0][0]) == model.n and \
+                bundle.manifest.get('fit_fingerprint') == trained_fingerprint(years[:n_old], values[:n_old], 'linear', params):
+            for x, y in zip(x_train[model.n:], y_train[model.n:]):
+                model.update(x, y)
+            return model
+    return None
+
+
+def train_linear(years, values, model_file, indicator=None, country=None, params=None):
+    """
+    custom_linear_regression_forecast.py: closed-form fit on the training split,
+    or an O(1) update per new year of the model a previous run left.
+    """
+    (x_train, y_train), (x_test, y_test) = split(years, values)
+    model = extend_linear(model_file, years, values, x_train, y_train, params)
+    if model is None:
+        model = fit_linear(x_train, y_train, **(params or {}))
+    metrics = errors(y_test, model.predict(x_test))
+    _save(model_file, 'linear', model, years, values, metrics, indicator, country, params)
+    return metrics
+
+
+def train_random_forest(years, values, model_file, indicator=None, country=None, params=None):
+    """
+    custom_random_forest_forecast.py: 100 trees on Year alone, fitted on the
+    training split. Only the compiled step function is saved.
+    """
+    from sklearn.metrics import r2_score
+
+    (x_train, y_train), (x_test, y_test) = split(years, values)
+    model = fit_random_forest(x_train, y_train, **(params or {}))
+
+    predictions = model.predict(x_test) if len(x_test) else np.empty(0)
+    metrics = errors(y_test, predictions)
+    metrics['r2'] = float(r2_score(y_test, predictions)) if len(x_test) else None
+    metrics['test_data_available'] = bool(len(x_test))
+    _save(model_file, 'random_forest', model, years, values, metrics, indicator, country, params)
+    return metrics
+
+
+def train_prophet(years, values, model_file, indicator=None, country=None, params=None):
+    """
+    prophet_forecast.py: trend-only Prophet fitted on the full history (the script
+    does not hold out a test set), warm-started from the model a previous run left.
+    """
+    from custom_forecasting_model.prophet_lite import export_prophet
+    from custom_forecasting_model.prophet_warm_start import load_previous
+
+    model, fit_stats = _fit_prophet(years, values, previous=load_previous(model_file), **(params or {}))
+    metrics = {'rmse': None, 'mae': None, **fit_stats}
+    _save(model_file, 'prophet', export_prophet(model), years, values, metrics, indicator, country, params)
+    return metrics
+
+
+MODEL_FITTERS = {
+    'linear': fit_linear,
+    'random_forest': fit_random_forest,
+    'prophet': fit_prophet_lite,
+}
+
+# The fitter each trainer calls, whose defaults are part of its fit_config()
+TRAINER_FITTERS = {
+    'linear': fit_linear,
+    'random_forest': fit_random_forest,
+    'prophet': _fit_prophet,
+}
+
+# Trainers by model type, with a rough relative cost per fit used to schedule the
+# slowest jobs first (a Stan fit takes seconds, a closed-form fit microseconds)
+MODEL_TRAINERS = {
+    'linear': train_linear,
+    'random_forest': train_random_forest,
+    'prophet': train_prophet,
+}
+MODEL_COSTS = {
+    'linear': 1,
+    'random_forest': 100,
+    'prophet': 1000,
+}
@@ -1,29 +1,130 @@
-
-import pickle
+import argparse
+import csv
+import itertools
+import json
 import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 # --- Configuration ---
-MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression_model.pkl')
-
-# --- Load the Model ---
-print(f"Loading model from {MODEL_FILE}...")
-try:
-    with open(MODEL_FILE, 'rb') as f:
-        model = pickle.load(f)
-except FileNotFoundError:
-    print(f"Error: Model file not found at {MODEL_FILE}. Please run the training script first.")
-    sys.exit(1)
-
-m = model['m']
-c = model['c']
-print("Model loaded successfully.")
-
-# --- Make a Prediction ---
+MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression.bundle')
+LEGACY_MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression_model.pkl')  # Written by older training runs
+CHUNK_SIZE = 10000  # Records read, predicted and written together in batch mode
+
+# Nothing heavy is imported at module level. A single-year prediction reads m and
+# c from the linear bundle's manifest with the json module alone, so it starts
+# about as fast as a bare interpreter. Batch mode imports NumPy and the model
+# registry only when it runs. Bundles are NumPy-only, so pandas, sklearn and
+# Prophet are never loaded; the legacy pickle is the one exception and is only
+# read when there is no bundle.
+
+
+def load_linear(model_file=MODEL_FILE, legacy_model_file=LEGACY_MODEL_FILE):
+    """(m, c) of the single-series linear model: from the bundle's manifest, else the legacy pickle."""
+    manifest_file = os.path.join(model_file, 'manifest.json')
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            params = json.load(f)['params']
+    else:
+        import pickle
+        with open(legacy_model_file, 'rb') as f:
+            params = pickle.load(f)
+    return params['m'], params['c']
+
+
+def read_records(lines, default_model='linear'):
+    """(indicator, year, model) per CSV row of `indicator,year[,model]`; a header row is skipped."""
+    for row in csv.reader(lines):
+        if not row or row[0].strip().lower() == 'indicator':
+            continue
+        yield row[0], row[1].strip() if len(row) > 1 else '', (row[2].strip() if len(row) > 2 else '') or default_model
+
+
+def predict_chunk(registry, records, country=None):
+    """(indicator, year, model, prediction, error) for each record, with one predict call per model in the chunk."""
+    import numpy as np
+
+    groups = {}
+    results = [None] * len(records)
+    for i, (indicator, year, model_type) in enumerate(records):
+        try:
+            groups.setdefault((indicator, model_type), []).append((i, int(year)))
+        except ValueError:
+            results[i] = (indicator, year, model_type, None, f"Invalid year: {year!r}")
+
+    for (indicator, model_type), members in groups.items():
+        years = np.array([year for _, year in members], dtype=np.int64)
+        try:
+            predictions = registry.predict(indicator, model_type, years, country)
+            error = None
+        except Exception as e:
+            predictions, error = [None] * len(members), str(e.args[0] if isinstance(e, KeyError) else e)
+        for (i, year), prediction in zip(members, predictions):
+            results[i] = (indicator, year, model_type, None if prediction is None else float(prediction), error)
+    return results
+
+
+def run_batch(lines, out, model_type='linear', country=None, output_format='csv', chunk_size=CHUNK_SIZE):
+    """Stream `indicator,year[,model]` records from lines to out as CSV or JSONL, chunk_size at a time."""
+    from custom_forecasting_model.registry import default_registry
+
+    registry = default_registry()
+    records = read_records(lines, model_type)
+    writer = csv.writer(out, lineterminator='\n') if output_format == 'csv' else None
+    if writer:
+        writer.writerow(['indicator', 'year', 'model', 'prediction', 'error'])
+    count = failed = 0
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+        for indicator, year, model, prediction, error in predict_chunk(registry, chunk, country):
+            if writer:
+                writer.writerow([indicator, year, model, '' if prediction is None else repr(prediction), error or ''])
+            else:
+                out.write(json.dumps({'indicator': indicator, 'year': year, 'model': model,
+                                      'prediction': prediction, 'error': error}) + '\n')
+            failed += error is not None
+        count += len(chunk)
+        out.flush()
+    return count, failed
+
+
 if __name__ == '__main__':
-    if len(sys.argv) > 1:
+    parser = argparse.ArgumentParser(
+        description="Predict one year with the linear model, or stream indicator,year records in batch mode.")
+    parser.add_argument('year', nargs='?', help="Year to predict with the single-series linear model.")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="Read indicator,year[,model] records from FILE, or stdin when omitted or '-'.")
+    parser.add_argument('--model', default='linear', help="Model type for records that do not name one.")
+    parser.add_argument('--country', default=None, help="Country ISO3 code; any country when omitted.")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="Batch output format.")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.batch is not None:
+        source = sys.stdin if args.batch == '-' else open(args.batch, 'r', newline='')
+        try:
+            count, failed = run_batch(source, sys.stdout, args.model, args.country, args.format, args.chunk_size)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        print(f"{count} records predicted, {failed} failed.", file=sys.stderr)
+        sys.exit(0)
+
+    # m and c are in the bundle's manifest: loading reads one small JSON file, whatever the model size
+    print(f"Loading model from {MODEL_FILE}...")
+    try:
+        m, c = load_linear()
+    except FileNotFoundError:
+        print(f"Error: Model file not found at {MODEL_FILE}. Please run the training script first.")
+        sys.exit(1)
+    print("Model loaded successfully.")
+
+    if args.year is not None:
         try:
-            year_to_predict = int(sys.argv[1])
+            year_to_predict = int(args.year)
             prediction = m * year_to_predict + c
             print(f"\nPrediction for year {year_to_predict}: {prediction:.2f}")
         except ValueError:
@@ -2,15 +2,20 @@ import streamlit as st
 import pandas as pd
 import pickle
 import os
-from prophet import Prophet
-from prophet.plot import plot_plotly
-from datetime import datetime
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.prophet_lite import ProphetLite, export_prophet
+from custom_forecasting_model.artifact_bundle import load_model_bundle
+from custom_forecasting_model.forecast_cache import build_forecast_table, load_forecast_table, model_fingerprint
 
 # ================================
 # CONFIG
 # ================================
 OUTPUT_DIR = "./custom_forecasting_model/output"
 MODEL_FILE = os.path.join(OUTPUT_DIR, "prophet_model.pkl")
+BUNDLE_FILE = os.path.join(OUTPUT_DIR, "prophet.bundle")  # Evaluated with NumPy; Prophet is never imported
+CACHE_FILE = os.path.join(OUTPUT_DIR, "prophet_forecast.bundle")  # Forecast table written at training time
 
 # ================================
 # PAGE SETTINGS
@@ -24,22 +29,41 @@ st.write("Predict long-term values using a saved Prophet model with clear interp
 # ================================
 st.subheader("📁 Load Prophet Model")
 
-if not os.path.exists(MODEL_FILE):
+
+# Both caches are keyed by the model file's fingerprint, so a retrained model replaces them
+@st.cache_resource
+def load_model(fingerprint):
+    if os.path.isdir(BUNDLE_FILE):
+        return load_model_bundle(BUNDLE_FILE)[0]
+    # Older training runs saved only the Prophet pickle; unpickling it imports Prophet once
+    with open(MODEL_FILE, "rb") as f:
+        return ProphetLite(export_prophet(pickle.load(f)))
+
+
+@st.cache_data
+def load_forecast(fingerprint):
+    """The precomputed table through 2100, or a live prediction when it is missing or stale."""
+    table = load_forecast_table(fingerprint, CACHE_FILE)
+    if table is None:
+        table = build_forecast_table(load_model(fingerprint))
+    return table
+
+
+if not os.path.isdir(BUNDLE_FILE) and not os.path.exists(MODEL_FILE):
     st.error(f"❌ Model file not found: {MODEL_FILE}")
     st.stop()
 
-with open(MODEL_FILE, "rb") as f:
-    model = pickle.load(f)
+fingerprint = model_fingerprint(BUNDLE_FILE if os.path.isdir(BUNDLE_FILE) else MODEL_FILE)
+model = load_model(fingerprint)
+forecast_table = load_forecast(fingerprint)
 
 st.success("✅ Prophet model loaded successfully!")
 
 # ================================
 # DETERMINE LAST TRAINING YEAR
 # ================================
-temp_df = model.make_future_dataframe(periods=1, freq="Y")
-temp_fc = model.predict(temp_df)
-
-last_year_in_data = temp_fc['ds'].dt.year.max()
+# Year of the first future date, as read from a one-period forecast before (the history's dates are 1 January)
+last_year_in_data = pd.Timestamp(model.future_dates(1)[0]).year
 
 st.info(f"📌 Last available year in the training dataset: **{last_year_in_data}**")
 
@@ -63,8 +87,8 @@ st.write(f"➡️ Forecasting **{years_ahead} years** beyond the dataset.")
 # ================================
 # GENERATE FORECAST (+1 FIX)
 # ================================
-future_df = model.make_future_dataframe(periods=years_ahead + 1, freq="Y")
-forecast = model.predict(future_df)
+# Read from the cached table: the history plus the year-ends up to one year past the selected year
+forecast = forecast_table[forecast_table["ds"].dt.year <= future_year + 1]
 
 # ================================
 # GET THE SPECIFIC FORECASTED ROW
@@ -132,8 +156,7 @@ st.dataframe(
 # INTERACTIVE FORECAST PLOT
 # ================================
 st.subheader("📊 Interactive Forecast Visualization")
-fig = plot_plotly(model, forecast)
-st.plotly_chart(fig, use_container_width=True)
+st.line_chart(forecast.set_index("ds")[["y", "yhat", "yhat_lower", "yhat_upper"]])
 
 # ================================
 # PNG IMAGES
@@ -3,25 +3,51 @@ import matplotlib.pyplot as plt
 from prophet import Prophet
 import pickle
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import load_indicator
+from data_prep.prepare import prepare_indicator
+from custom_forecasting_model.prophet_warm_start import fit_prophet, load_previous, log_fit
+from custom_forecasting_model.prophet_lite import ProphetLite, export_prophet
+from custom_forecasting_model.artifact_bundle import bundle_fingerprint, data_fingerprint, save_model_bundle
+from custom_forecasting_model.models import trained_fingerprint
+from custom_forecasting_model.forecast_cache import (build_forecast_table, load_forecast_table, model_fingerprint,
+                                                    save_forecast_table)
 
 # ================================
 # CONFIGURATION
 # ================================
 INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+DATA_SOURCE = 'store'  # 'prepare' rebuilds the data in memory from resources/ without touching data/
+COUNTRY = 'PHL'  # Country ISO3 code of the series to forecast
 INDICATOR_TO_FORECAST = 'Electric power consumption (kWh per capita)'
 OUTPUT_DIR = './custom_forecasting_model/output'
 MODEL_FILE = os.path.join(OUTPUT_DIR, 'prophet_model.pkl')
+BUNDLE_FILE = os.path.join(OUTPUT_DIR, 'prophet.bundle')  # NumPy-only form served by prophet_app.py
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'prophet_forecast.bundle')  # Forecast table through 2100 for prophet_app.py
 FORECAST_YEARS = 10
+WARM_START = True  # Seed the optimizer with the parameters of the previously saved MODEL_FILE
+MODEL_CONFIG = {
+    'yearly_seasonality': False,   # No yearly patterns for per-capita electricity
+    'weekly_seasonality': False,
+    'daily_seasonality': False,
+    'changepoint_prior_scale': 0.2,  # smoother curve
+}
+REUSE_UNCHANGED = True  # Keep the saved model and forecast cache when this series and MODEL_CONFIG are unchanged
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ================================
 # LOAD & PREPARE DATA
 # ================================
-print(f"Loading data from {INPUT_FILE}...")
+print(f"Loading data for {INDICATOR_TO_FORECAST}...")
 
-df = pd.read_csv(INPUT_FILE)
-df = df[df['Indicator'] == INDICATOR_TO_FORECAST].copy()
+if DATA_SOURCE == 'prepare':
+    df = prepare_indicator(INDICATOR_TO_FORECAST, COUNTRY)
+else:
+    df = load_indicator(INDICATOR_TO_FORECAST, INPUT_STORE_DIR, INPUT_FILE, COUNTRY)
 
 # Prophet requires columns: ds (date) and y (value)
 df_prophet = df[['Year', 'Value']].copy()
@@ -36,28 +62,55 @@ print(df_prophet.head())
 # ================================
 # TRAIN PROPHET MODEL
 # ================================
-print("\nTraining Prophet model...")
-
-model = Prophet(
-    yearly_seasonality=False,   # No yearly patterns for per-capita electricity
-    weekly_seasonality=False,
-    daily_seasonality=False,
-    changepoint_prior_scale=0.2,  # smoother curve
-)
-
-model.fit(df_prophet)
-
-print("Prophet training complete.")
-
-# ================================
-# SAVE PROPHET MODEL (.pkl)
-# ================================
-print(f"Saving model to {MODEL_FILE}...")
-
-with open(MODEL_FILE, "wb") as f:
-    pickle.dump(model, f)
-
-print("Model saved successfully.")
+# Reuse the saved model when neither the series nor the config changed since it was fitted
+fingerprint = trained_fingerprint(df['Year'].values, df['Value'].values, 'prophet', MODEL_CONFIG)
+reuse = REUSE_UNCHANGED and os.path.exists(MODEL_FILE) and bundle_fingerprint(BUNDLE_FILE) == fingerprint
+
+if reuse:
+    print("\nSeries and config unchanged since the saved model was fitted; reusing it.")
+    with open(MODEL_FILE, "rb") as f:
+        model = pickle.load(f)
+else:
+    print("\nTraining Prophet model...")
+
+    model = Prophet(**MODEL_CONFIG)
+
+    previous = load_previous(MODEL_FILE) if WARM_START else None
+    fit_stats = fit_prophet(model, df_prophet, previous)
+    log_fit(fit_stats, INDICATOR_TO_FORECAST)
+
+    print("Prophet training complete.")
+    print(f"{'Warm' if fit_stats['warm_start'] else 'Cold'} fit: "
+          f"{fit_stats['iterations']} iterations in {fit_stats['seconds']:.3f}s")
+
+    # ================================
+    # SAVE PROPHET MODEL (.pkl)
+    # ================================
+    print(f"Saving model to {MODEL_FILE}...")
+
+    with open(MODEL_FILE, "wb") as f:
+        pickle.dump(model, f)
+
+    print("Model saved successfully.")
+
+    artifact = export_prophet(model)
+    save_model_bundle(
+        BUNDLE_FILE, 'prophet', artifact,
+        metrics=fit_stats,
+        indicator=INDICATOR_TO_FORECAST,
+        country=COUNTRY,
+        fingerprint=data_fingerprint(df['Year'].values, df['Value'].values),
+        fit_fingerprint=fingerprint,
+    )
+    print(f"NumPy inference artifact saved to {BUNDLE_FILE}")
+
+# The cache is keyed by the bundle, so a reused model keeps its table unless the table went missing
+if load_forecast_table(model_fingerprint(BUNDLE_FILE), CACHE_FILE) is None:
+    forecast_table = build_forecast_table(ProphetLite(export_prophet(model)))
+    save_forecast_table(forecast_table, model_fingerprint(BUNDLE_FILE), CACHE_FILE)
+    print(f"Forecast table through {forecast_table['ds'].dt.year.max()} cached in {CACHE_FILE}")
+else:
+    print(f"Forecast table in {CACHE_FILE} is up to date.")
 
 # ================================
 # FORECAST FUTURE YEARS
@@ -0,0 +1,188 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+
+# --- Configuration ---
+OUTPUT_DIR = './custom_forecasting_model/output'
+MODEL_FILE = os.path.join(OUTPUT_DIR, 'prophet_model.pkl')
+BUNDLE_FILE = os.path.join(OUTPUT_DIR, 'prophet.bundle')
+UNCERTAINTY_SEED = 0  # Seed of the simulated intervals, so the same model always gives the same bands
+
+# A fitted Prophet model is a handful of arrays: the piecewise-linear trend (k, m,
+# delta at changepoints_t), one beta vector per Fourier seasonality, and the
+# constants that map dates and values to the scaled problem Stan solved. The
+# exporter copies those into plain NumPy arrays, saved as a bundle by
+# artifact_bundle.py; ProphetLite evaluates yhat with the same formulas as
+# Prophet.predict, and simulates intervals the way Prophet does (new changepoints
+# on the future plus observation noise), vectorized over all samples at once.
+# Neither Prophet nor Stan is imported.
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _seconds(ds):
+    """Seconds since the epoch of datetime-likes (pandas Series, datetime64 arrays or ISO strings)."""
+    return np.asarray(ds, dtype='datetime64[ns]').astype(np.int64) / 1e9
+
+
+def export_prophet(model):
+    """Plain-array form of a fitted Prophet model with linear or flat growth and Fourier seasonalities."""
+    if model.growth not in ('linear', 'flat'):
+        raise ValueError(f"Only linear and flat growth can be exported, not {model.growth!r}.")
+    if model.extra_regressors or model.holidays is not None or getattr(model, 'country_holidays', None):
+        raise ValueError("Models with holidays or extra regressors cannot be exported.")
+
+    params = {name: np.asarray(model.params[name]).mean(axis=0) for name in ['k', 'm', 'delta', 'sigma_obs', 'beta']}
+    component_cols = model.train_component_cols
+    seasonalities = []
+    for name, props in model.seasonalities.items():
+        if props['condition_name'] is not None:
+            raise ValueError(f"Conditional seasonality {name!r} cannot be exported.")
+        columns = component_cols[name].to_numpy() == 1
+        seasonalities.append({
+            'name': name,
+            'period': float(props['period']),
+            'fourier_order': int(props['fourier_order']),
+            'mode': props['mode'],
+            'beta': params['beta'][columns],
+        })
+
+    history = model.history
+    return {
+        'growth': model.growth,
+        'start': float(_seconds([model.start])[0]),
+        't_scale': float(model.t_scale.total_seconds()),
+        'y_scale': float(model.y_scale),
+        'scaling': getattr(model, 'scaling', 'absmax'),
+        'floor': float(model.y_min) if getattr(model, 'scaling', 'absmax') == 'minmax' else 0.0,
+        'k': float(params['k'][0]),
+        'm': float(params['m'][0]),
+        'delta': params['delta'],
+        'changepoints_t': np.asarray(model.changepoints_t, dtype=float),
+        'sigma_obs': float(params['sigma_obs'][0]),
+        'beta': params['beta'],  # All coefficients in Stan's order, for warm-starting a refit
+        'seasonalities': seasonalities,
+        'interval_width': float(model.interval_width),
+        'uncertainty_samples': int(model.uncertainty_samples or 0),
+        'history_ds': history['ds'].to_numpy(dtype='datetime64[ns]'),
+        'history_y': history['y'].to_numpy(dtype=float),
+    }
+
+
+def piecewise_linear(t, deltas, k, m, changepoints_t):
+    """Prophet's trend on the scaled time axis, as Prophet.piecewise_linear."""
+    active = (changepoints_t[None, :] <= t[:, None]) * deltas
+    k_t = k + active.sum(axis=1)
+    m_t = m + (active * -changepoints_t).sum(axis=1)
+    return k_t * t + m_t
+
+
+class ProphetLite:
+    """Evaluates an exported Prophet model on any dates with NumPy only."""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.history_ds = np.asarray(artifact['history_ds'], dtype='datetime64[ns]')
+        self.history_y = np.asarray(artifact['history_y'], dtype=float)
+
+    @property
+    def last_history_year(self):
+        return int(self.history_ds.max().astype('datetime64[Y]').astype(int) + 1970)
+
+    def future_dates(self, periods):
+        """The `periods` year-end dates after the history, as make_future_dataframe(periods, freq='Y') adds them."""
+        last = self.history_ds.max()
+        next_years = np.arange(self.last_history_year + 1, self.last_history_year + periods + 2) - 1970
+        year_ends = next_years.astype('datetime64[Y]').astype('datetime64[ns]') - np.timedelta64(1, 'D')
+        return year_ends[year_ends > last][:periods]
+
+    def _t(self, seconds):
+        return (seconds - self.artifact['start']) / self.artifact['t_scale']
+
+    def trend(self, t):
+        a = self.artifact
+        if a['growth'] == 'flat':
+            return np.full_like(t, a['m']) * a['y_scale'] + a['floor']
+        return piecewise_linear(t, a['delta'], a['k'], a['m'], a['changepoints_t']) * a['y_scale'] + a['floor']
+
+    def seasonal_terms(self, seconds):
+        """(additive, multiplicative) seasonal terms, in the same units as Prophet's forecast columns."""
+        days = seconds / SECONDS_PER_DAY
+        additive = np.zeros_like(days)
+        multiplicative = np.zeros_like(days)
+        for season in self.artifact['seasonalities']:
+            orders = np.arange(1, season['fourier_order'] + 1)
+            angles = 2 * np.pi * days[:, None] * orders / season['period']
+            # Columns alternate sin, cos per order, as in Prophet.fourier_series
+            features = np.stack([np.sin(angles), np.cos(angles)], axis=-1).reshape(len(days), -1)
+            term = features @ season['beta']
+            if season['mode'] == 'additive':
+                additive += term * self.artifact['y_scale']
+            else:
+                multiplicative += term
+        return additive, multiplicative
+
+    def predict(self, ds):
+        """yhat for every date in ds."""
+        seconds = _seconds(ds)
+        additive, multiplicative = self.seasonal_terms(seconds)
+        return self.trend(self._t(seconds)) * (1 + multiplicative) + additive
+
+    def predict_interval(self, ds, n_samples=None, seed=UNCERTAINTY_SEED):
+        """
+        (yhat, lower, upper) for every date in ds. The bands come from n_samples
+        simulated futures (the model's uncertainty_samples by default), drawn in
+        one batch from a seeded generator, so they are reproducible.
+        """
+        a = self.artifact
+        seconds = _seconds(ds)
+        t = self._t(seconds)
+        additive, multiplicative = self.seasonal_terms(seconds)
+        yhat = self.trend(t) * (1 + multiplicative) + additive
+
+        n_samples = n_samples or a['uncertainty_samples']
+        if not n_samples:
+            return yhat, yhat.copy(), yhat.copy()
+        rng = np.random.default_rng(seed)
+
+        # Future changepoints: a Poisson number per sample on (1, T], padded to the largest count with zero deltas
+        T = t.max(initial=0.0)
+        n_changepoints = len(a['changepoints_t'])
+        counts = rng.poisson(n_changepoints * (T - 1), n_samples) if T > 1 else np.zeros(n_samples, dtype=int)
+        width = int(counts.max(initial=0))
+        new_t = 1 + rng.random((n_samples, width)) * (T - 1)
+        scale = np.mean(np.abs(a['delta'])) + 1e-8
+        new_deltas = rng.laplace(0, scale, (n_samples, width)) * (np.arange(width) < counts[:, None])
+
+        # A changepoint at c with rate change delta adds delta * (t - c) from c on, so the
+        # sampled changepoints only add to the fitted trend; one column of them at a time
+        trend = np.tile(self.trend(t), (n_samples, 1))
+        if a['growth'] == 'linear':
+            for j in range(width):
+                trend += a['y_scale'] * new_deltas[:, j:j + 1] * np.maximum(t - new_t[:, j:j + 1], 0)
+
+        noise = rng.normal(0, a['sigma_obs'], (n_samples, len(t))) * a['y_scale']
+        samples = trend * (1 + multiplicative) + additive + noise
+        lower_p = 100 * (1.0 - a['interval_width']) / 2
+        upper_p = 100 * (1.0 + a['interval_width']) / 2
+        lower, upper = np.percentile(samples, [lower_p, upper_p], axis=0)
+        return yhat, lower, upper
+
+
+if __name__ == '__main__':
+    # Export an already trained prophet_model.pkl
+    print(f"Loading model from {MODEL_FILE}...")
+    try:
+        with open(MODEL_FILE, 'rb') as f:
+            model = pickle.load(f)
+    except FileNotFoundError:
+        print(f"Error: Model file not found at {MODEL_FILE}. Please run the training script first.")
+        sys.exit(1)
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from custom_forecasting_model.artifact_bundle import save_model_bundle
+
+    save_model_bundle(BUNDLE_FILE, 'prophet', export_prophet(model))
+    print(f"Exported to {BUNDLE_FILE}.")
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+FIT_LOG_FILE = os.path.join('./custom_forecasting_model/output', 'prophet_fit_log.jsonl')  # One line per fit
+PARAM_NAMES = ['k', 'm', 'sigma_obs', 'delta', 'beta']
+
+# Prophet fits its parameters on a scaled problem: y / y_scale against
+# t = (ds - start) / t_scale. A refit on a longer history changes both scales,
+# so the previous parameters are mapped onto the new ones before they seed the
+# optimizer: values scale by y_scale_old / y_scale_new, and slopes also by
+# t_scale_new / t_scale_old. Anything the mapping cannot cover (logistic growth,
+# a moved start, 'minmax' scaling, a different number of changepoints) falls
+# back to a cold fit instead of a misleading start.
+
+
+def warm_start_state(model):
+    """What a refit needs from a fitted Prophet: its point-estimate parameters and scales."""
+    params = {name: np.asarray(model.params[name]).mean(axis=0) for name in PARAM_NAMES}
+    return {
+        'params': params,
+        'y_scale': float(model.y_scale),
+        't_scale': pd.Timedelta(model.t_scale).total_seconds(),
+        'start': pd.Timestamp(model.start),
+        'growth': model.growth,
+        'scaling': getattr(model, 'scaling', 'absmax'),
+    }
+
+
+def bundle_state(bundle):
+    """warm_start_state() of the model exported to a prophet bundle, or None if it was saved without beta."""
+    if 'beta' not in bundle:
+        return None
+    p = bundle.params
+    return {
+        'params': {
+            'k': np.array([p['k']]),
+            'm': np.array([p['m']]),
+            'sigma_obs': np.array([p['sigma_obs']]),
+            'delta': np.asarray(bundle['delta']),
+            'beta': np.asarray(bundle['beta']),
+        },
+        'y_scale': p['y_scale'],
+        't_scale': p['t_scale'],
+        'start': pd.Timestamp(p['start'], unit='s'),
+        'growth': p['growth'],
+        'scaling': p.get('scaling', 'absmax'),
+    }
+
+
+def load_previous(model_file):
+    """Warm-start state from a prophet bundle, a pickled Prophet model (or a pickled warm_start_state()), or None."""
+    if not os.path.exists(model_file):
+        return None
+    if os.path.isdir(model_file):
+        from custom_forecasting_model.artifact_bundle import Bundle
+        return bundle_state(Bundle(model_file))
+    with open(model_file, 'rb') as f:
+        saved = pickle.load(f)
+    if isinstance(saved, dict) and 'params' in saved:
+        return saved
+    if getattr(saved, 'params', None):
+        return warm_start_state(saved)
+    return None
+
+
+def expected_changepoints(model, n_rows):
+    """How many changepoints Prophet will place for a history of n_rows, as in Prophet.set_changepoints()."""
+    if model.changepoints is not None:
+        return len(model.changepoints)
+    hist_size = int(np.floor(n_rows * model.changepoint_range))
+    return max(0, min(model.n_changepoints, hist_size - 1))
+
+
+def warm_start_init(model, df, state):
+    """Initial values for fitting `model` on df, or None when the previous fit cannot seed it."""
+    params = state['params']
+    if state['growth'] not in ('linear', 'flat') or model.growth != state['growth']:
+        return None
+    if state['scaling'] != 'absmax' or getattr(model, 'scaling', 'absmax') != 'absmax':
+        return None
+    if pd.Timestamp(df['ds'].min()) != state['start']:
+        return None
+    if len(params['delta']) != max(1, expected_changepoints(model, len(df))):
+        return None
+
+    y_scale = float(np.abs(df['y']).max()) or 1.0
+    t_scale = (pd.Timestamp(df['ds'].max()) - pd.Timestamp(df['ds'].min())).total_seconds()
+    value_ratio = state['y_scale'] / y_scale
+    slope_ratio = value_ratio * t_scale / state['t_scale']
+    return {
+        'k': float(params['k'][0]) * slope_ratio,
+        'm': float(params['m'][0]) * value_ratio,
+        'sigma_obs': float(params['sigma_obs'][0]) * value_ratio,
+        'delta': params['delta'] * slope_ratio,
+        'beta': params['beta'] * value_ratio,
+    }
+
+
+def fit_prophet(model, df, previous=None):
+    """
+    Fit `model` on df, seeded from `previous` (a warm_start_state()) when it can
+    be. Returns the fit statistics: whether the warm start was used, the number
+    of optimizer iterations and the wall time in seconds.
+    """
+    init = warm_start_init(model, df, previous) if previous is not None else None
+    kwargs = {'save_iterations': True} if model.mcmc_samples == 0 else {}
+    if init is not None:
+        kwargs['init'] = init
+
+    start = time.perf_counter()
+    model.fit(df, **kwargs)
+    seconds = time.perf_counter() - start
+
+    iterations = None
+    stan_fit = getattr(model, 'stan_fit', None)
+    if model.mcmc_samples == 0 and stan_fit is not None:
+        iterations = int(stan_fit.optimized_iterations_np.shape[0])
+    return {'warm_start': init is not None, 'iterations': iterations, 'seconds': round(seconds, 4)}
+
+
+def log_fit(stats, indicator, fit_log_file=FIT_LOG_FILE):
+    """Append one fit's statistics, so warm and cold fits can be compared over time."""
+    os.makedirs(os.path.dirname(fit_log_file) or '.', exist_ok=True)
+    with open(fit_log_file, 'a') as f:
+        f.write(json.dumps({'indicator': indicator, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **stats}) + '\n')
+
+
+if __name__ == '__main__':
+    # Benchmark: fit on all years but the last, then refit on the full history cold and warm
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from prophet import Prophet
+    from data_prep.long_store import load_indicator
+
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+    indicator = sys.argv[1] if len(sys.argv) > 1 else 'Electric power consumption (kWh per capita)'
+    df = load_indicator(indicator)
+    df_prophet = pd.DataFrame({'ds': pd.to_datetime(df['Year'].astype(str), format='%Y'), 'y': df['Value']})
+
+    def new_model():
+        return Prophet(yearly_seasonality=False, weekly_seasonality=False, daily_seasonality=False,
+                       changepoint_prior_scale=0.2)
+
+    previous = new_model()
+    fit_prophet(previous, df_prophet.iloc[:-1])
+    cold = fit_prophet(new_model(), df_prophet)
+    warm = fit_prophet(new_model(), df_prophet, warm_start_state(previous))
+    print(f"Refit of {indicator} with one more year:")
+    print(f"  cold: {cold['iterations']} iterations in {cold['seconds']:.3f}s")
+    print(f"  warm: {warm['iterations']} iterations in {warm['seconds']:.3f}s (warm start used: {warm['warm_start']})")
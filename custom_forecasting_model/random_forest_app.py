@@ -1,16 +1,26 @@
 import streamlit as st
 import pickle
 import os
+import sys
 import pandas as pd
 from PIL import Image
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.artifact_bundle import load_model_bundle
+
 # --- Configuration ---
 MODEL_FILE = os.path.join('custom_forecasting_model/output', 'random_forest_model.pkl')
+BUNDLE_FILE = os.path.join('custom_forecasting_model/output', 'random_forest.bundle')  # Served without scikit-learn
 PLOT_FILE = os.path.join('custom_forecasting_model/output', 'random_forest_forecast_plot.png')
 
 # --- Load the Model and Metrics ---
 @st.cache_resource  # Cache the model loading
 def load_model():
+    # The compiled step function gives the same predictions as the forest from two memory-mapped arrays
+    if os.path.isdir(BUNDLE_FILE):
+        compiled, bundle = load_model_bundle(BUNDLE_FILE)
+        return {'model': compiled, 'metrics': bundle.metrics}
+
     try:
         with open(MODEL_FILE, 'rb') as f:
             loaded_data = pickle.load(f)
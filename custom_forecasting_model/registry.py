@@ -0,0 +1,262 @@
+import argparse
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.artifact_bundle import (MANIFEST_FILE, MODEL_TYPES, Bundle, load_model_bundle, manifest_version,
+                                                      read_manifest)
+
+# --- Configuration ---
+OUTPUT_DIR = './custom_forecasting_model/output'
+MAX_CACHE_BYTES = 256 * 1024 * 1024  # Budget of the loaded-model cache
+
+# The registry indexes every model bundle under OUTPUT_DIR by (indicator, country,
+# model type, version) from the manifests; the version is the content hash the
+# manifest records. When several bundles serve the same series and model type,
+# a bundle of that one series is preferred over a row of a batch bundle, and
+# then the first bundle path in sorted order, so every clone serves the same
+# model unless a version is asked for. Lookups go through a dict keyed by (indicator, model type), so they cost
+# the same with one model or thousands. A linear_batch bundle from
+# batch_linear_regression.py is registered as one linear model per series row.
+# Models are loaded on first use into an LRU cache that accounts each one at the
+# size of its arrays plus its manifest, evicting the least recently used models
+# once the total passes max_bytes, so one large forest or Prophet model can push
+# out many small ones. One registry can serve every trained model in a process.
+
+BATCH_MODEL_TYPES = {'linear_batch': 'linear'}  # Bundles of many series, and the model type each row serves as
+
+
+class RegistryEntry:
+    """One indexed model: a bundle, or one row of a batch bundle."""
+
+    def __init__(self, bundle_dir, manifest, row=None, indicator=None, country=None, metrics=None):
+        self.bundle_dir = bundle_dir
+        self.row = row
+        self.indicator = manifest['indicator'] if row is None else indicator
+        self.country = manifest['country'] if row is None else country
+        self.model_type = BATCH_MODEL_TYPES.get(manifest['model_type'], manifest['model_type'])
+        manifest_file = os.path.join(bundle_dir, MANIFEST_FILE)
+        # Bundles written before manifests carried a version get the same hash computed here
+        self.version = manifest.get('version') or manifest_version(manifest)
+        self.stamp = _stamp(manifest_file)
+        self.metrics = manifest['metrics'] if row is None else metrics
+        # Rows of a batch share their bundle, which is loaded and accounted once
+        self.nbytes = os.path.getsize(manifest_file) + sum(
+            np.dtype(array['dtype']).itemsize * int(np.prod(array['shape'])) for array in manifest['arrays'].values()
+        )
+
+    @property
+    def key(self):
+        return self.indicator, self.country, self.model_type, self.version
+
+    @property
+    def entry_id(self):
+        return self.bundle_dir if self.row is None else f'{self.bundle_dir}#{self.row}'
+
+    @property
+    def cache_key(self):
+        """A bundle rewritten in place gets a new version, so its old model is never served from the cache."""
+        return self.bundle_dir, self.version
+
+    @property
+    def rank(self):
+        """Sort key of the entries serving one series; the lowest serves by default."""
+        return self.row is not None, self.entry_id
+
+
+def _stamp(manifest_file):
+    """Changes whenever the manifest is rewritten: write_bundle() swaps in a new file."""
+    stat = os.stat(manifest_file)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _batch_entries(bundle_dir, manifest):
+    """One entry per series of a batch bundle that had enough points to fit."""
+    bundle = Bundle(bundle_dir)
+    n_train = np.asarray(bundle['n_train']) if 'n_train' in bundle else None
+    rmse = np.asarray(bundle['rmse']) if 'rmse' in bundle else None
+    return [
+        RegistryEntry(bundle_dir, manifest, i, indicator, country,
+                      {'rmse': None if rmse is None or np.isnan(rmse[i]) else float(rmse[i])})
+        for i, (indicator, country) in enumerate(manifest['params']['keys'])
+        if n_train is None or n_train[i] > 1
+    ]
+
+
+def year_inputs(model_type, years):
+    """What each model type's predict() takes for these years. Prophet gets 1 January, as in its training history."""
+    years = np.asarray(years, dtype=np.int64)
+    if model_type == 'prophet':
+        return (years - 1970).astype('datetime64[Y]').astype('datetime64[ns]')
+    if model_type == 'random_forest':
+        return years.reshape(-1, 1)
+    return years
+
+
+class ModelRegistry:
+    def __init__(self, root=OUTPUT_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.entries = {}  # entry_id -> RegistryEntry
+        self._index = {}  # (indicator, model type) -> {country: [entries, by rank]}
+        self._cache = OrderedDict()  # (bundle_dir, version) -> (model, nbytes), least recently used first
+        self._lock = threading.Lock()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh()
+
+    def refresh(self):
+        """Rescan root for bundles. Cached models stay loaded; ones whose bundle is gone or rewritten are dropped."""
+        entries = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if MANIFEST_FILE not in filenames:
+                continue
+            dirnames[:] = []  # A bundle holds no other bundles
+            try:
+                manifest = read_manifest(dirpath)
+            except (ValueError, OSError):
+                continue
+            if manifest['model_type'] in BATCH_MODEL_TYPES:
+                entries.update((entry.entry_id, entry) for entry in _batch_entries(dirpath, manifest))
+            elif manifest['model_type'] in MODEL_TYPES:
+                entries[dirpath] = RegistryEntry(dirpath, manifest)
+
+        index = {}
+        for entry in entries.values():
+            index.setdefault((entry.indicator, entry.model_type), {}).setdefault(entry.country, []).append(entry)
+        for countries in index.values():
+            for versions in countries.values():
+                versions.sort(key=lambda entry: entry.rank)
+
+        live = {entry.cache_key for entry in entries.values()}
+        with self._lock:
+            self.entries = entries
+            self._index = index
+            for key in [key for key in self._cache if key not in live]:
+                self.cached_bytes -= self._cache.pop(key)[1]
+        return self
+
+    def find(self, indicator, model_type='linear', country=None, version=None):
+        """The entry for this series and model type: the given version, or else the one of lowest rank."""
+        countries = self._index.get((indicator, model_type), {})
+        candidates = countries.get(country, []) if country is not None else \
+            [versions[0] if version is None else entry for versions in countries.values() for entry in versions]
+        matches = [entry for entry in candidates if version is None or entry.version == version]
+        if not matches:
+            raise KeyError(f"No {model_type} model for {indicator!r}"
+                           f"{f' in {country}' if country else ''}{f' version {version}' if version else ''}.")
+        if country is None and len({entry.country for entry in matches}) > 1:
+            raise ValueError(f"Several countries have a {model_type} model for {indicator!r}; pass country= to pick one.")
+        return min(matches, key=lambda entry: entry.rank)
+
+    def is_current(self, entry):
+        """Whether entry's bundle is still the one indexed, from one stat of its manifest."""
+        try:
+            return _stamp(os.path.join(entry.bundle_dir, MANIFEST_FILE)) == entry.stamp
+        except OSError:
+            return False
+
+    def _load(self, entry):
+        with self._lock:
+            cached = self._cache.get(entry.cache_key)
+            if cached is not None:
+                self._cache.move_to_end(entry.cache_key)
+                self.hits += 1
+                return cached[0] if entry.row is None else cached[0].row(entry.row)
+            self.misses += 1
+
+        model, _ = load_model_bundle(entry.bundle_dir)
+        with self._lock:
+            if entry.cache_key not in self._cache:
+                self._cache[entry.cache_key] = (model, entry.nbytes)
+                self.cached_bytes += entry.nbytes
+            # Evict from the cold end; the model just loaded always stays, even when it alone is over budget
+            while self.cached_bytes > self.max_bytes and len(self._cache) > 1:
+                _, (_, nbytes) = self._cache.popitem(last=False)
+                self.cached_bytes -= nbytes
+                self.evictions += 1
+        return model if entry.row is None else model.row(entry.row)
+
+    def get_model(self, indicator, model_type='linear', country=None, version=None):
+        """The model ready to predict, loaded on first use."""
+        return self._load(self.find(indicator, model_type, country, version))
+
+    def predict(self, indicator, model_type, years, country=None, version=None):
+        """Predictions for an array of years."""
+        model = self.get_model(indicator, model_type, country, version)
+        return np.asarray(model.predict(year_inputs(model_type, years)), dtype=float)
+
+    def predict_many(self, requests):
+        """
+        Predictions for many (indicator, model type, years[, country]) requests, in
+        order. Requests for the same model are answered with a single predict call.
+        """
+        requests = [tuple(request) + (None,) * (4 - len(request)) for request in requests]
+        groups = {}
+        for i, (indicator, model_type, years, country) in enumerate(requests):
+            groups.setdefault((indicator, model_type, country), []).append(i)
+
+        results = [None] * len(requests)
+        for (indicator, model_type, country), positions in groups.items():
+            year_arrays = [np.atleast_1d(np.asarray(requests[i][2], dtype=np.int64)) for i in positions]
+            predictions = self.predict(indicator, model_type, np.concatenate(year_arrays), country)
+            splits = np.cumsum([len(years) for years in year_arrays])[:-1]
+            for i, chunk in zip(positions, np.split(predictions, splits)):
+                results[i] = chunk
+        return results
+
+    def stats(self):
+        return {
+            'models': len(self.entries),
+            'cached_models': len(self._cache),
+            'cached_bytes': self.cached_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# One shared registry per process, created on first use
+_DEFAULT_REGISTRY = None
+
+
+def default_registry():
+    global _DEFAULT_REGISTRY
+    if _DEFAULT_REGISTRY is None:
+        _DEFAULT_REGISTRY = ModelRegistry()
+    return _DEFAULT_REGISTRY
+
+
+def get_model(indicator, model_type='linear', country=None, version=None):
+    return default_registry().get_model(indicator, model_type, country, version)
+
+
+def predict_many(requests):
+    return default_registry().predict_many(requests)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="List the trained models, or predict with one of them.")
+    parser.add_argument('--indicator', help="Indicator to predict; lists the registry when omitted.")
+    parser.add_argument('--model', default='linear', help=f"Model type ({', '.join(MODEL_TYPES)}).")
+    parser.add_argument('--country', default=None, help="Country ISO3 code; may be omitted when one country has the model.")
+    parser.add_argument('--years', nargs='+', type=int, default=[2030])
+    args = parser.parse_args()
+
+    registry = default_registry()
+    if args.indicator is None:
+        for entry in sorted(registry.entries.values(), key=lambda e: (str(e.indicator), str(e.country), e.model_type, e.version)):
+            print(f"{entry.model_type:<14} {entry.country or '-':<4} {entry.version}  {entry.nbytes / 1024:8.1f} KB  "
+                  f"{entry.indicator}")
+        print(f"{len(registry.entries)} models under {registry.root}")
+    else:
+        predictions = registry.predict(args.indicator, args.model, args.years, args.country)
+        for year, value in zip(args.years, predictions):
+            print(f"Year: {year}, Predicted Value: {value:.2f}")
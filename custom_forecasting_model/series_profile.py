@@ -0,0 +1,185 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.energy_data_preprocess import COUNTRY_COLUMN
+from custom_forecasting_model.backtest import backtest
+from custom_forecasting_model.batch_linear_regression import load_long, series_matrix
+from custom_forecasting_model.models import MODEL_COSTS
+
+# --- Configuration ---
+RAW_WIDE_FILE = os.path.join('data', 'processed_energy_data_cleaned.csv')  # Before handle_missing_data.py imputes it
+OUTPUT_DIR = './custom_forecasting_model/output'
+ROUTES_FILE = os.path.join(OUTPUT_DIR, 'series_routes.csv')
+CONSTANT_RTOL = 1e-9  # Range within this share of the mean magnitude counts as constant
+MIN_POINTS = 15  # With fewer real (not imputed) points a forest or Prophet has nothing to learn a line misses
+MAX_IMPUTED_SHARE = 0.4  # Above this share of filled-in years there is little real signal left (handle_missing_data.py drops columns above 0.5)
+LINEAR_R2 = 0.95  # In-sample R² of the closed-form fit from which a line is accurate enough
+ACCURACY_THRESHOLD = 0.5  # Backtest RMSE / standard deviation of the series that a model type must reach
+ROUTING_FOLDS = 3  # Backtest folds per candidate model type for the series the rules do not settle
+
+# Profiling scores every series at once from the Series x Year matrix: length,
+# constancy, share of years that were imputed (from the wide file before
+# imputation) and the R² of the closed-form line. Constant, short, mostly imputed
+# and near-linear series go to the linear model outright. The rest are
+# backtested on a few folds, cheapest model type first, and take the first one
+# whose error is within ACCURACY_THRESHOLD standard deviations, or else the most
+# accurate one. The routing backtests time every fold's fit; the report uses
+# those times both for what routing cost and for what it saves.
+
+
+def imputed_matrix(df_long, raw_wide_file=RAW_WIDE_FILE):
+    """1.0 where a (series, year) of df_long was missing before imputation, else 0.0, laid out as series_matrix(df_long)."""
+    raw = pd.read_csv(raw_wide_file)
+    id_columns = [column for column in [COUNTRY_COLUMN, 'Year'] if column in raw.columns]
+    missing = raw.melt(id_vars=id_columns, var_name='Indicator', value_name='Missing')
+    missing['Missing'] = missing['Missing'].isna().astype(float)
+    missing['Year'] = missing['Year'].astype(np.int64)
+
+    keys = [column for column in id_columns + ['Indicator'] if column in df_long.columns]
+    flags = df_long[keys].astype({'Year': np.int64}).merge(missing, on=keys, how='left')
+    # A series with no raw column came from somewhere else; treat its years as observed
+    flags['Value'] = flags['Missing'].fillna(0.0)
+    flags['Indicator'] = df_long['Indicator'].to_numpy()
+    return series_matrix(flags)[2]
+
+
+def profile(keys, years, values, imputed=None):
+    """One row per series with its length, real points, range, imputed share, linear R² and class."""
+    observed = ~np.isnan(values)
+    length = observed.sum(axis=1)
+    safe_length = np.maximum(length, 1)
+
+    with np.errstate(invalid='ignore'):
+        lowest = np.nanmin(np.where(observed, values, np.inf), axis=1)
+        highest = np.nanmax(np.where(observed, values, -np.inf), axis=1)
+    value_range = np.where(length > 0, highest - lowest, 0.0)
+
+    # Closed-form fit on every series at once from centred sums
+    x = np.where(observed, years[None, :].astype(float), 0.0)
+    y = np.where(observed, values, 0.0)
+    mean_x = x.sum(axis=1) / safe_length
+    mean_y = y.sum(axis=1) / safe_length
+    dx = np.where(observed, x - mean_x[:, None], 0.0)
+    dy = np.where(observed, y - mean_y[:, None], 0.0)
+    co_xx, co_yy, co_xy = (dx * dx).sum(axis=1), (dy * dy).sum(axis=1), (dx * dy).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r2 = np.where((co_xx > 0) & (co_yy > 0), co_xy ** 2 / (co_xx * co_yy), 1.0)
+
+    constant = value_range <= CONSTANT_RTOL * np.maximum(np.abs(mean_y), 1.0)
+    imputed_share = (np.where(observed, imputed, 0.0).sum(axis=1) / safe_length if imputed is not None
+                     else np.zeros(len(keys)))
+
+    real_points = np.rint(length * (1 - imputed_share)).astype(int)
+
+    series_class = np.select(
+        [constant, real_points < MIN_POINTS, imputed_share > MAX_IMPUTED_SHARE, r2 >= LINEAR_R2],
+        ['constant', 'short', 'mostly_imputed', 'linear'],
+        default='nonlinear',
+    )
+    return pd.DataFrame({
+        'indicator': [indicator for indicator, _ in keys],
+        'country': [country for _, country in keys],
+        'length': length,
+        'real_points': real_points,
+        'range': value_range,
+        'std': np.sqrt(co_yy / safe_length),
+        'imputed_share': imputed_share,
+        'linear_r2': r2,
+        'class': series_class,
+    })
+
+
+def route(profiles, model_types=('linear', 'random_forest', 'prophet'), threshold=ACCURACY_THRESHOLD,
+          folds=ROUTING_FOLDS, max_workers=None):
+    """
+    Add the routed model type (and, for backtested series, its normalised error)
+    to profiles. Also returns {model type: (folds fitted, seconds spent fitting
+    them)} measured by the routing backtests.
+    """
+    timings = {}
+    profiles = profiles.copy()
+    profiles['model'] = 'linear'
+    profiles['nrmse'] = np.nan
+    pending = profiles.index[profiles['class'] == 'nonlinear']
+
+    for model_type in sorted(model_types, key=lambda m: MODEL_COSTS.get(m, 1)):
+        if len(pending) == 0:
+            break
+        # Only the pending series, not every country of their indicators
+        series = set(zip(profiles.loc[pending, 'indicator'], profiles.loc[pending, 'country']))
+        results, _ = backtest(model_types=[model_type], max_folds=folds, max_workers=max_workers, series=series)
+        timings[model_type] = (int(results['folds'].sum()), float((results['fit_seconds'] * results['folds']).sum()))
+        scores = profiles.loc[pending, ['indicator', 'country', 'std']].merge(
+            results[['indicator', 'country', 'rmse']], on=['indicator', 'country'], how='left')
+        scores.index = pending
+        nrmse = scores['rmse'] / scores['std'].where(scores['std'] > 0)
+
+        # Remember the best model type so far, for series no model type gets within the threshold
+        better = nrmse.notna() & ~(nrmse >= profiles.loc[pending, 'nrmse'])
+        profiles.loc[better[better].index, 'model'] = model_type
+        profiles.loc[better[better].index, 'nrmse'] = nrmse[better]
+        pending = pending[~(nrmse <= threshold).to_numpy()]
+    return profiles, timings
+
+
+def report(routes, timings, model_types=('linear', 'random_forest', 'prophet')):
+    """
+    Series per class and model type, and the fit time routing saves over fitting
+    every model type on every series, net of the fits the routing backtests made.
+    Fit times are the mean per fold measured by those backtests.
+    """
+    counts = routes.groupby(['class', 'model']).size().unstack(fill_value=0)
+    print(counts.to_string())
+    fit_seconds = {model_type: seconds / n for model_type, (n, seconds) in timings.items() if n}
+    routing = sum(seconds for _, seconds in timings.values())
+    unmeasured = [model_type for model_type in model_types if model_type not in fit_seconds]
+    if unmeasured:
+        print(f"\nNo fit times measured for {', '.join(unmeasured)}, since no series was backtested with them; "
+              f"routing cost {routing:.1f}s of fits.")
+        return
+
+    every_model = len(routes) * sum(fit_seconds[model_type] for model_type in model_types)
+    routed = routes['model'].map(fit_seconds).sum()
+    print("\nMeasured time of one fit: " + ", ".join(f"{model_type} {fit_seconds[model_type]:.3g}s"
+                                                        for model_type in model_types))
+    print(f"Fit time: {routed:.1f}s routed vs {every_model:.1f}s for every model type on every series. "
+          f"Routing itself took {routing:.1f}s of fits, so the first run saves {every_model - routed - routing:.1f}s "
+          f"and every later run {every_model - routed:.1f}s.")
+
+
+def read_routes(routes_file=ROUTES_FILE):
+    """{(indicator, country): model type} from the last routing run, or {} when there was none."""
+    if not os.path.exists(routes_file):
+        return {}
+    routes = pd.read_csv(routes_file, keep_default_na=False)
+    return dict(zip(zip(routes['indicator'], routes['country'].where(routes['country'] != '', None)), routes['model']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile every series and route it to the cheapest adequate model.")
+    parser.add_argument('--threshold', type=float, default=ACCURACY_THRESHOLD,
+                        help="Largest backtest RMSE, in standard deviations of the series, that is adequate.")
+    parser.add_argument('--folds', type=int, default=ROUTING_FOLDS)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes; one per CPU by default.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df_long = load_long()
+    keys, years, values = series_matrix(df_long)
+    imputed = imputed_matrix(df_long) if os.path.exists(RAW_WIDE_FILE) else None
+    profiles = profile(keys, years, values, imputed)
+    print(f"Profiled {len(profiles)} series in {time.perf_counter() - start:.2f}s.")
+    print(profiles['class'].value_counts().to_string())
+
+    routes, timings = route(profiles, threshold=args.threshold, folds=args.folds, max_workers=args.workers)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    routes.to_csv(ROUTES_FILE, index=False)
+    print()
+    report(routes, timings)
+    print(f"Routes saved to {ROUTES_FILE}")
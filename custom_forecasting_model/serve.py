@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.registry import MAX_CACHE_BYTES, OUTPUT_DIR, ModelRegistry, year_inputs
+
+# --- Configuration ---
+HOST = '127.0.0.1'
+PORT = 8000
+MAX_WORKERS = None  # Processes for offloaded model types; None means one per CPU
+OFFLOAD_MODEL_TYPES = ('prophet',)  # Predicted in the worker pool, so the event loop never waits on them
+INLINE_THREADS = 4  # Threads that load bundles and predict the other model types, off the event loop
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_REQUESTS_PER_BATCH = 10000
+LATENCY_WINDOW = 10000  # Latest request latencies kept for the percentiles
+
+# A small HTTP/1.1 server on asyncio streams, with no dependency beyond NumPy.
+# All bundles are indexed once by a ModelRegistry and loaded on first use.
+#
+#   GET  /health   liveness
+#   GET  /models   every servable (indicator, country, model type, version)
+#   GET  /stats    request, prediction and latency counters, and the model cache
+#   POST /refresh  rescan the output directory for new bundles
+#   POST /predict  {"requests": [{"indicator": ..., "model": "linear", "years": [2030, 2035],
+#                                 "country": "PHL", "intervals": false}, ...]}
+#
+# /predict answers a whole batch in one call. Requests for the same model are
+# merged into one vectorized predict(). Linear and forest groups run on a few
+# threads sharing the service's registry, so a cold bundle load never stalls
+# the event loop; groups of an OFFLOAD_MODEL_TYPES model (Prophet, whose
+# uncertainty intervals simulate hundreds of futures) go to a process pool whose
+# workers hold their own registries. Before a group is predicted, one stat of
+# its bundle's manifest tells whether the bundle was retrained or removed since
+# the last scan; if so the registry rescans, which also drops the old model from
+# its cache. Workers are always asked for the exact version the service found,
+# so a worker that has not seen it yet rescans its own registry. Each request's
+# years are checked on their own, and a bad request or a failed group only
+# fails its own requests.
+
+# Set once in every worker by _init_worker()
+_WORKER_REGISTRY = None
+
+
+def _init_worker(root, max_bytes):
+    global _WORKER_REGISTRY
+    _WORKER_REGISTRY = ModelRegistry(root, max_bytes)
+
+
+def parse_years(value):
+    """A request's years as a 1-D int64 array; a single year is allowed, nested lists and fractional years are not."""
+    years = np.asarray(value)
+    if years.ndim > 1:
+        raise ValueError("years must be a year or a flat list of years")
+    if years.size and years.dtype.kind not in 'iuf':
+        raise ValueError("years must be numbers")
+    if years.dtype.kind == 'f' and not np.all(np.isfinite(years) & (years == np.round(years))):
+        raise ValueError("years must be whole numbers")
+    return np.atleast_1d(years).astype(np.int64)
+
+
+def predict_with(registry, indicator, model_type, country, version, years, intervals=False):
+    """Predictions of one model for an array of years; (yhat, lower, upper) with intervals."""
+    model = registry.get_model(indicator, model_type, country, version)
+    inputs = year_inputs(model_type, years)
+    if intervals and hasattr(model, 'predict_interval'):
+        return tuple(np.asarray(array, dtype=float) for array in model.predict_interval(inputs))
+    return (np.asarray(model.predict(inputs), dtype=float),)
+
+
+def predict_group(indicator, model_type, country, version, years, intervals=False):
+    """predict_with() in a worker, on the worker's own registry."""
+    try:
+        return predict_with(_WORKER_REGISTRY, indicator, model_type, country, version, years, intervals)
+    except KeyError:
+        # Trained after this worker started
+        _WORKER_REGISTRY.refresh()
+        return predict_with(_WORKER_REGISTRY, indicator, model_type, country, version, years, intervals)
+
+
+class ServiceStats:
+    """Counters since start-up, with latency percentiles over the last LATENCY_WINDOW requests."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.predict_requests = 0
+        self.predictions = 0
+        self.offloaded_groups = 0
+        self.by_path = {}
+        self.latencies = deque(maxlen=window)
+
+    def record(self, path, status, seconds):
+        self.requests += 1
+        self.errors += status >= 400
+        self.by_path[path] = self.by_path.get(path, 0) + 1
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        uptime = time.time() - self.started
+        latencies = np.array(self.latencies) * 1000
+        percentiles = np.percentile(latencies, [50, 95, 99]) if len(latencies) else [None] * 3
+        return {
+            'uptime_seconds': round(uptime, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'requests_by_path': self.by_path,
+            'batches': self.batches,
+            'predict_requests': self.predict_requests,
+            'predictions': self.predictions,
+            'offloaded_groups': self.offloaded_groups,
+            'requests_per_second': self.requests / uptime if uptime else None,
+            'predictions_per_second': self.predictions / uptime if uptime else None,
+            'latency_ms': {
+                'mean': float(latencies.mean()) if len(latencies) else None,
+                'p50': percentiles[0], 'p95': percentiles[1], 'p99': percentiles[2],
+                'max': float(latencies.max()) if len(latencies) else None,
+            },
+        }
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+class ForecastService:
+    def __init__(self, root=OUTPUT_DIR, max_bytes=MAX_CACHE_BYTES, max_workers=MAX_WORKERS,
+                 offload_model_types=OFFLOAD_MODEL_TYPES, inline_threads=INLINE_THREADS):
+        self.registry = ModelRegistry(root, max_bytes)
+        self.offload_model_types = set(offload_model_types)
+        self.executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), initializer=_init_worker,
+                                            initargs=(root, max_bytes))
+        # The registry locks its cache, so these threads can share it
+        self.threads = ThreadPoolExecutor(max_workers=inline_threads)
+        self.stats = ServiceStats()
+
+    # --- Endpoints ---
+
+    def models(self):
+        return {'models': [
+            {'indicator': e.indicator, 'country': e.country, 'model': e.model_type, 'version': e.version,
+             'bytes': e.nbytes, 'metrics': e.metrics}
+            for e in sorted(self.registry.entries.values(), key=lambda e: (str(e.indicator), str(e.country),
+                                                                            e.model_type, e.version))
+        ]}
+
+    async def predict(self, body):
+        requests = body.get('requests') if isinstance(body, dict) else None
+        if not isinstance(requests, list):
+            raise HTTPError(400, 'Expected {"requests": [{"indicator": ..., "model": ..., "years": [...]}, ...]}.')
+        if len(requests) > MAX_REQUESTS_PER_BATCH:
+            raise HTTPError(413, f"At most {MAX_REQUESTS_PER_BATCH} requests per batch.")
+
+        # Group the requests by model, remembering where each one's years sit in the group's array
+        results = [None] * len(requests)
+        groups = {}
+        for i, request in enumerate(requests):
+            try:
+                key = (request['indicator'], request.get('model', 'linear'), request.get('country'),
+                       request.get('version'), bool(request.get('intervals', False)))
+                years = parse_years(request['years'])
+                groups.setdefault(key, []).append((i, years))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                results[i] = {'error': f"Invalid request: {e}"}
+
+        pending = []
+        loop = asyncio.get_running_loop()
+        for key, members in groups.items():
+            indicator, model_type, country, version, intervals = key
+            years = np.concatenate([member_years for _, member_years in members])
+            try:
+                entry = self.registry.find(indicator, model_type, country, version)
+                if not self.registry.is_current(entry):
+                    # Retrained or removed since the last scan
+                    await loop.run_in_executor(self.threads, self.registry.refresh)
+                    entry = self.registry.find(indicator, model_type, country, version)
+            except (KeyError, ValueError) as e:
+                for i, _ in members:
+                    results[i] = {'error': str(e.args[0])}
+                continue
+            if model_type in self.offload_model_types:
+                future = loop.run_in_executor(self.executor, predict_group, indicator, model_type, entry.country,
+                                              entry.version, years, intervals)
+                self.stats.offloaded_groups += 1
+            else:
+                future = loop.run_in_executor(self.threads, predict_with, self.registry, indicator, model_type,
+                                              entry.country, entry.version, years, intervals)
+            pending.append((entry, members, future))
+
+        for (entry, members, future), outcome in zip(
+                pending, await asyncio.gather(*(future for _, _, future in pending), return_exceptions=True)):
+            if isinstance(outcome, Exception):
+                for i, _ in members:
+                    results[i] = {'error': f"Prediction failed: {outcome}"}
+            else:
+                self._scatter(results, entry, members, outcome)
+
+        self.stats.batches += 1
+        self.stats.predict_requests += len(requests)
+        self.stats.predictions += sum(len(r['predictions']) for r in results if 'predictions' in r)
+        return {'results': results}
+
+    def _scatter(self, results, entry, members, arrays):
+        """Split a group's (yhat[, lower, upper]) arrays back into its requests' results."""
+        names = ['predictions', 'lower', 'upper']
+        splits = np.cumsum([len(years) for _, years in members])[:-1]
+        columns = [np.split(np.asarray(array, dtype=float), splits) for array in arrays]
+        for m, (i, years) in enumerate(members):
+            results[i] = {
+                'indicator': entry.indicator, 'country': entry.country, 'model': entry.model_type,
+                'version': entry.version, 'years': years.tolist(),
+                **{name: column[m].tolist() for name, column in zip(names, columns)},
+            }
+
+    async def route(self, method, path, body):
+        if path == '/health':
+            return {'status': 'ok'}
+        if path == '/models':
+            return self.models()
+        if path == '/stats':
+            return {'service': self.stats.snapshot(), 'model_cache': self.registry.stats()}
+        if path == '/refresh':
+            if method != 'POST':
+                raise HTTPError(405, 'Use POST.')
+            # A rescan walks the output directory, so it runs off the event loop too
+            await asyncio.get_running_loop().run_in_executor(self.threads, self.registry.refresh)
+            return {'models': len(self.registry.entries)}
+        if path == '/predict':
+            if method != 'POST':
+                raise HTTPError(405, 'Use POST.')
+            try:
+                payload = json.loads(body or b'{}')
+            except json.JSONDecodeError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            return await self.predict(payload)
+        raise HTTPError(404, f"No endpoint {path}.")
+
+    # --- HTTP ---
+
+    async def handle(self, reader, writer):
+        """Serve one connection, answering requests until the client closes it or asks to."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                path = '?'
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    path = target.split('?', 1)[0]
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, f"Bodies are limited to {MAX_BODY_BYTES} bytes.")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = 200, await self.route(method, path, body)
+                except HTTPError as e:
+                    status, payload, version = e.status, {'error': str(e)}, 'HTTP/1.1'
+                except ValueError as e:
+                    status, payload, version = 400, {'error': f"Malformed request: {e}"}, 'HTTP/1.1'
+                except Exception as e:
+                    status, payload, version = 500, {'error': str(e)}, 'HTTP/1.1'
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                self.stats.record(path, status, time.perf_counter() - start)
+                if not keep_alive or status == 413:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving {len(self.registry.entries)} models on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.threads.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve batched forecasts over HTTP.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Worker processes for Prophet; one per CPU by default.")
+    parser.add_argument('--root', default=OUTPUT_DIR, help="Directory searched for model bundles.")
+    args = parser.parse_args()
+
+    service = ForecastService(args.root, max_workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -2,19 +2,27 @@
 import streamlit as st
 import pickle
 import os
+import sys
 import pandas as pd # For displaying the plot
 from PIL import Image # For displaying the plot
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from custom_forecasting_model.artifact_bundle import read_manifest
+
 # --- Configuration ---
-MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression_model.pkl')
+MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression.bundle')
+LEGACY_MODEL_FILE = os.path.join('./custom_forecasting_model/output', 'linear_regression_model.pkl')  # Written by older training runs
 PLOT_FILE = os.path.join('./custom_forecasting_model/output', 'custom_forecast_plot.png')
 
 # --- Load the Model ---
 @st.cache_resource # Cache the model loading
 def load_model():
     try:
-        with open(MODEL_FILE, 'rb') as f:
-            model = pickle.load(f)
+        if os.path.isdir(MODEL_FILE):
+            model = read_manifest(MODEL_FILE)['params']
+        else:
+            with open(LEGACY_MODEL_FILE, 'rb') as f:
+                model = pickle.load(f)
         return model['m'], model['c']
     except FileNotFoundError:
         st.error(f"Model file not found at {MODEL_FILE}. Please run the training script first.")
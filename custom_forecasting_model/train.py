@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.series_index import open_index
+from custom_forecasting_model.artifact_bundle import bundle_fingerprint
+from custom_forecasting_model.models import MODEL_COSTS, MODEL_TRAINERS, trained_fingerprint
+from custom_forecasting_model.series_profile import read_routes
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+OUTPUT_DIR = './custom_forecasting_model/output'
+MODELS_DIR = os.path.join(OUTPUT_DIR, 'models')  # One bundle per (model type, country, indicator)
+CHECKPOINT_FILE = os.path.join(OUTPUT_DIR, 'train_checkpoint.jsonl')
+TUNED_PARAMS_FILE = os.path.join(OUTPUT_DIR, 'tuned_params.json')  # Written by tune.py
+MAX_WORKERS = None  # None means one process per CPU
+
+# Set once in every worker by _init_worker(), so jobs carry only their keys
+_INDEX = None
+
+
+def model_file(model_type, indicator, country, models_dir=MODELS_DIR):
+    """Where a job's model bundle goes: a readable slug of the indicator plus a short hash so names never collide."""
+    slug = re.sub(r'[^0-9A-Za-z]+', '_', indicator).strip('_')[:60]
+    digest = hashlib.sha1(indicator.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(models_dir, model_type, country or 'all', f'{slug}-{digest}.bundle')
+
+
+def read_tuned_params(tuned_params_file=TUNED_PARAMS_FILE):
+    """{(model type, indicator, country): hyperparameters} chosen by tune.py, or {} before any tuning run."""
+    if not os.path.exists(tuned_params_file):
+        return {}
+    with open(tuned_params_file, 'r') as f:
+        return {(r['model'], r['indicator'], r['country']): r['params'] for r in json.load(f)}
+
+
+def read_checkpoint(checkpoint_file=CHECKPOINT_FILE):
+    """{(model type, indicator, country): record} of the jobs finished by earlier runs."""
+    done = {}
+    if not os.path.exists(checkpoint_file):
+        return done
+    with open(checkpoint_file, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run; that job simply runs again
+            done[(record['model'], record['indicator'], record['country'])] = record
+    return done
+
+
+def _init_worker(store_dir, csv_file):
+    # The store is memory-mapped, so every worker shares the same pages instead of a pickled copy of the data
+    global _INDEX
+    _INDEX = open_index(store_dir, csv_file)
+
+
+def run_job(model_type, indicator, country, models_dir=MODELS_DIR, params=None):
+    """Fit one (series, model) job in a worker and return its checkpoint record."""
+    years, values = _INDEX.series(indicator, country)
+    path = model_file(model_type, indicator, country, models_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    start = time.perf_counter()
+    metrics = MODEL_TRAINERS[model_type](np.asarray(years, dtype=np.int64), np.asarray(values, dtype=float), path,
+                                         indicator=indicator, country=country, params=params)
+    return {
+        'model': model_type,
+        'indicator': indicator,
+        'country': country,
+        'model_file': path,
+        'metrics': metrics,
+        'params': params,
+        'n_points': int(len(years)),
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+def plan_jobs(index, indicators='all', model_types='all', countries=None):
+    """Every requested (model type, indicator, country), most expensive first."""
+    model_types = list(MODEL_TRAINERS) if model_types == 'all' else list(model_types)
+    unknown = set(model_types) - set(MODEL_TRAINERS)
+    if unknown:
+        raise ValueError(f"Unknown model types: {', '.join(sorted(unknown))}")
+
+    if indicators != 'all':
+        missing = sorted(set(indicators) - set(index.indicators))
+        if missing:
+            print(f"Warning: no data for {len(missing)} indicators: {', '.join(missing)}")
+
+    keys = [
+        (indicator, country) for indicator, country in index.keys()
+        if (indicators == 'all' or indicator in indicators) and (countries is None or country in countries)
+    ]
+    jobs = [(model_type, indicator, country) for model_type in model_types for indicator, country in sorted(keys, key=str)]
+    # Longest job first: the pool never ends on a lone Prophet fit while the other workers sit idle
+    jobs.sort(key=lambda job: MODEL_COSTS.get(job[0], 1), reverse=True)
+    return jobs
+
+
+def train(indicators='all', model_types='all', countries=None, store_dir=INPUT_STORE_DIR, csv_file=INPUT_FILE,
+          checkpoint_file=CHECKPOINT_FILE, models_dir=MODELS_DIR, resume=True, max_workers=MAX_WORKERS, tuned=False,
+          routed=False):
+    """
+    Train every (series, model type) pair on a process pool. A pair whose bundle
+    was saved with the same fit fingerprint (series data, model type and
+    hyperparameters) is unchanged and keeps its model, so an interrupted or
+    repeated run only fits what is new or changed; resume=False refits
+    everything. Finished jobs are appended to checkpoint_file as they complete.
+    With tuned set, series tuned by tune.py are fitted with their best
+    hyperparameters instead of the scripts' defaults. With routed set, each
+    series routed by series_profile.py is fitted only with its routed model
+    type. Returns the records of every finished job, including earlier runs',
+    and a {'reused', 'refit', 'added'} count of this run's pairs.
+    """
+    if not resume and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    done = read_checkpoint(checkpoint_file)
+    index = open_index(store_dir, csv_file)
+    routes = read_routes() if routed else {}
+    tuned_params = read_tuned_params() if tuned else {}
+
+    summary = {'reused': 0, 'refit': 0, 'added': 0}
+    jobs = {}
+    for job in plan_jobs(index, indicators, model_types, countries):
+        model_type, indicator, country = job
+        if routes.get((indicator, country), model_type) != model_type:
+            continue
+        params = tuned_params.get(job)
+        fingerprint = trained_fingerprint(*index.series(indicator, country), model_type, params)
+        path = model_file(model_type, indicator, country, models_dir)
+        if resume and bundle_fingerprint(path) == fingerprint:
+            summary['reused'] += 1
+            continue
+        jobs[job] = (params, fingerprint, 'refit' if os.path.isdir(path) else 'added')
+    print(f"{len(jobs)} jobs to run, {summary['reused']} unchanged.")
+
+    failed = 0
+    if jobs:
+        os.makedirs(os.path.dirname(checkpoint_file) or '.', exist_ok=True)
+        with open(checkpoint_file, 'a') as checkpoint, ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(), initializer=_init_worker, initargs=(store_dir, csv_file)
+        ) as executor:
+            futures = {executor.submit(run_job, *job, models_dir, params): job for job, (params, _, _) in jobs.items()}
+            for future in as_completed(futures):
+                job = futures[future]
+                model_type, indicator, country = job
+                try:
+                    record = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[failed] {model_type} / {country} / {indicator}: {e}")
+                    continue
+                _, record['fingerprint'], record['status'] = jobs[job]
+                summary[record['status']] += 1
+                checkpoint.write(json.dumps(record) + '\n')
+                checkpoint.flush()
+                done[job] = record
+                print(f"[{record['status']}] {model_type} / {country} / {indicator} in {record['seconds']:.2f}s")
+
+    print(f"Reused {summary['reused']}, refit {summary['refit']}, added {summary['added']}; "
+          f"{failed} failed and will be retried on the next run.")
+    return list(done.values()), summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train forecasting models for many indicators in parallel.")
+    parser.add_argument('--indicators', nargs='+', default=['all'], help="Indicator names, or 'all'.")
+    parser.add_argument('--models', nargs='+', default=['all'], help=f"Model types ({', '.join(MODEL_TRAINERS)}), or 'all'.")
+    parser.add_argument('--countries', nargs='+', default=None, help="Country ISO3 codes; all countries when omitted.")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Worker processes; one per CPU by default.")
+    parser.add_argument('--fresh', action='store_true', help="Refit every series, even those whose data is unchanged.")
+    parser.add_argument('--tuned', action='store_true', help="Use the hyperparameters chosen by tune.py.")
+    parser.add_argument('--routed', action='store_true', help="Fit each series only with the model type series_profile.py chose.")
+    args = parser.parse_args()
+
+    train(
+        indicators='all' if args.indicators == ['all'] else args.indicators,
+        model_types='all' if args.models == ['all'] else args.models,
+        countries=args.countries,
+        resume=not args.fresh,
+        max_workers=args.workers,
+        tuned=args.tuned,
+        routed=args.routed,
+    )
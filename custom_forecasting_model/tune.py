@@ -0,0 +1,229 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.series_index import open_index
+from custom_forecasting_model.artifact_bundle import data_fingerprint
+from custom_forecasting_model.backtest import HORIZON, MIN_TRAIN, WINDOW, fold_origins, fold_train_slice, forecast_errors
+from custom_forecasting_model.models import MODEL_COSTS, MODEL_FITTERS
+from custom_forecasting_model.registry import year_inputs
+
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+OUTPUT_DIR = './custom_forecasting_model/output'
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'tuning_cache.jsonl')  # One line per finished trial
+RESULTS_FILE = os.path.join(OUTPUT_DIR, 'tuned_params.json')
+ETA = 3  # Each rung keeps the best 1/ETA of the configs and gives them ETA times the folds
+MIN_FOLDS = 1  # Folds of the first rung
+MAX_FOLDS = 9  # Folds of the last rung
+MAX_WORKERS = None  # None means one process per CPU
+
+# Hyperparameters the scripts hard-code, and the values searched for each
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [25, 50, 100, 200],
+        'min_samples_leaf': [1, 2, 4],
+        'min_samples_split': [2, 4],
+    },
+    'prophet': {
+        'changepoint_prior_scale': [0.01, 0.03, 0.1, 0.2, 0.5, 1.0],
+    },
+}
+
+# Successive halving: every config of a series is first scored on its latest
+# MIN_FOLDS backtest folds, then only the best 1/ETA go on to ETA times as many
+# folds, until the survivors have MAX_FOLDS. Trials of all series in a rung run
+# together on a process pool. A finished trial is cached under the series' data
+# fingerprint, the config and the fold settings, so a repeat run skips it.
+
+# Set once in every worker by _init_worker(), so jobs carry only their keys
+_INDEX = None
+
+
+def configs(space):
+    """Every combination of a search space, as keyword-argument dicts."""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def rung_folds(eta=ETA, min_folds=MIN_FOLDS, max_folds=MAX_FOLDS):
+    """Fold budget of every rung: min_folds, min_folds * eta, ... up to max_folds."""
+    folds = [min_folds]
+    while folds[-1] < max_folds:
+        folds.append(min(folds[-1] * eta, max_folds))
+    return folds
+
+
+def trial_key(fingerprint, model_type, config, n_folds, horizon, window, min_train):
+    return json.dumps([fingerprint, model_type, config, n_folds, horizon, window, min_train], sort_keys=True)
+
+
+def read_cache(cache_file=CACHE_FILE):
+    """{trial key: metrics} of every trial finished by earlier runs."""
+    cache = {}
+    if not os.path.exists(cache_file):
+        return cache
+    with open(cache_file, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run; that trial simply runs again
+            cache[record['key']] = record['metrics']
+    return cache
+
+
+def _init_worker(store_dir, csv_file):
+    global _INDEX
+    _INDEX = open_index(store_dir, csv_file)
+
+
+def run_trial(job):
+    """Backtest one config of one series on its latest n_folds folds and return the metrics."""
+    model_type, indicator, country, config, n_folds, horizon, window, min_train = job
+    years, values = _INDEX.series(indicator, country)
+    years = np.asarray(years, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+
+    start = time.perf_counter()
+    origins = fold_origins(len(years), horizon, min_train, 1, n_folds)
+    actual = np.full((len(origins), horizon), np.nan)
+    predicted = np.full((len(origins), horizon), np.nan)
+    for f, origin in enumerate(origins):
+        train = fold_train_slice(origin, window)
+        test_years = years[origin:origin + horizon]
+        actual[f] = values[origin:origin + horizon]
+        try:
+            model = MODEL_FITTERS[model_type](years[train], values[train], **config)
+            predicted[f] = model.predict(year_inputs(model_type, test_years))
+        except Exception:
+            pass  # Leaves NaN: a config whose fits fail scores no better than its other folds
+    metrics = {name: float(value) for name, value in forecast_errors(actual, predicted).items()}
+    metrics['folds'] = len(origins)
+    metrics['seconds'] = round(time.perf_counter() - start, 4)
+    return metrics
+
+
+def _score(metrics):
+    # Lower is better; configs with no scored fold rank last
+    return metrics['rmse'] if metrics['n'] and not math.isnan(metrics['rmse']) else math.inf
+
+
+def tune(indicators='all', model_types=('random_forest', 'prophet'), countries=None, eta=ETA, min_folds=MIN_FOLDS,
+         max_folds=MAX_FOLDS, horizon=HORIZON, window=WINDOW, min_train=MIN_TRAIN, store_dir=INPUT_STORE_DIR,
+         csv_file=INPUT_FILE, cache_file=CACHE_FILE, resume=True, max_workers=MAX_WORKERS):
+    """
+    Successive-halving search of SEARCH_SPACES for every requested (model type,
+    series). Returns one record per pair with the best config and its metrics
+    on the last rung.
+    """
+    unknown = set(model_types) - set(SEARCH_SPACES)
+    if unknown:
+        raise ValueError(f"No search space for: {', '.join(sorted(unknown))}")
+    if not resume and os.path.exists(cache_file):
+        os.remove(cache_file)
+    cache = read_cache(cache_file)
+
+    index = open_index(store_dir, csv_file)
+    keys = [
+        (indicator, country) for indicator, country in index.keys()
+        if (indicators == 'all' or indicator in indicators) and (countries is None or country in countries)
+    ]
+    fingerprints = {key: data_fingerprint(*index.series(*key)) for key in keys}
+    # Alive configs of every (model type, series); the expensive model types first within a rung
+    alive = {
+        (model_type, key): configs(SEARCH_SPACES[model_type])
+        for model_type in sorted(model_types, key=lambda m: MODEL_COSTS.get(m, 1), reverse=True) for key in keys
+    }
+
+    os.makedirs(os.path.dirname(cache_file) or '.', exist_ok=True)
+    max_workers = max_workers or os.cpu_count()
+    results = {}
+    with open(cache_file, 'a') as cache_out, ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(store_dir, csv_file)
+    ) as executor:
+        budgets = rung_folds(eta, min_folds, max_folds)
+        for rung, n_folds in enumerate(budgets):
+            trials = [
+                (pair, config, trial_key(fingerprints[pair[1]], pair[0], config, n_folds, horizon, window, min_train))
+                for pair, pair_configs in alive.items() for config in pair_configs
+            ]
+            todo = [(pair, config, key) for pair, config, key in trials if key not in cache]
+            jobs = [(pair[0], *pair[1], config, n_folds, horizon, window, min_train) for pair, config, _ in todo]
+            start = time.perf_counter()
+            chunksize = max(1, len(jobs) // (max_workers * 8))
+            for (_, _, key), metrics in zip(todo, executor.map(run_trial, jobs, chunksize=chunksize)):
+                cache[key] = metrics
+                cache_out.write(json.dumps({'key': key, 'metrics': metrics}) + '\n')
+            cache_out.flush()
+            print(f"Rung {rung + 1}/{len(budgets)}: {len(trials)} trials on {n_folds} folds, "
+                  f"{len(trials) - len(todo)} cached, {time.perf_counter() - start:.2f}s")
+
+            # Keep the best 1/eta of every pair's configs for the next rung
+            scored = {}
+            for pair, config, key in trials:
+                scored.setdefault(pair, []).append((_score(cache[key]), config, cache[key]))
+            for pair, ranked in scored.items():
+                ranked.sort(key=lambda item: item[0])
+                results[pair] = ranked[0]
+                alive[pair] = [config for _, config, _ in ranked[:max(1, math.ceil(len(ranked) / eta))]]
+
+    return [
+        {'model': model_type, 'indicator': indicator, 'country': country, 'params': config, 'metrics': metrics}
+        for (model_type, (indicator, country)), (_, config, metrics) in results.items()
+    ]
+
+
+def merge_results(records, results_file=RESULTS_FILE):
+    """
+    Write records into results_file, replacing those of the same (model,
+    indicator, country) and keeping the rest, so tuning a subset never drops
+    the configs of earlier runs. Returns every record now in the file.
+    """
+    merged = {}
+    if os.path.exists(results_file):
+        with open(results_file, 'r') as f:
+            merged = {(r['model'], r['indicator'], r['country']): r for r in json.load(f)}
+    merged.update({(r['model'], r['indicator'], r['country']): r for r in records})
+    with open(results_file + '.tmp', 'w') as f:
+        json.dump(list(merged.values()), f, indent=2)
+    os.replace(results_file + '.tmp', results_file)
+    return list(merged.values())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tune model hyperparameters per series with successive halving.")
+    parser.add_argument('--indicators', nargs='+', default=['all'], help="Indicator names, or 'all'.")
+    parser.add_argument('--models', nargs='+', default=list(SEARCH_SPACES), help=f"Model types ({', '.join(SEARCH_SPACES)}).")
+    parser.add_argument('--countries', nargs='+', default=None, help="Country ISO3 codes; all countries when omitted.")
+    parser.add_argument('--eta', type=int, default=ETA)
+    parser.add_argument('--min-folds', type=int, default=MIN_FOLDS)
+    parser.add_argument('--max-folds', type=int, default=MAX_FOLDS)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Worker processes; one per CPU by default.")
+    parser.add_argument('--fresh', action='store_true', help="Ignore the trial cache and rerun every trial.")
+    args = parser.parse_args()
+
+    best = tune(
+        indicators='all' if args.indicators == ['all'] else args.indicators,
+        model_types=args.models,
+        countries=args.countries,
+        eta=args.eta,
+        min_folds=args.min_folds,
+        max_folds=args.max_folds,
+        resume=not args.fresh,
+        max_workers=args.workers,
+    )
+    merged = merge_results(best)
+    for record in best:
+        print(f"{record['model']} / {record['country']} / {record['indicator']}: {record['params']} "
+              f"(RMSE {record['metrics']['rmse']:.2f} over {record['metrics']['folds']} folds)")
+    print(f"Best configs of {len(best)} series saved to {RESULTS_FILE}, which now holds {len(merged)}.")
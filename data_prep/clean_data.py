@@ -1,12 +1,21 @@
 
 import os
 
-original_file_path = os.path.join('data', 'processed_energy_data.csv')
-cleaned_file_path = os.path.join('data', 'processed_energy_data_cleaned.csv')
+# --- Configuration ---
+INPUT_FILE = os.path.join('data', 'processed_energy_data.csv')
+OUTPUT_FILE = os.path.join('data', 'processed_energy_data_cleaned.csv')
 
-with open(original_file_path, 'r') as infile, open(cleaned_file_path, 'w', newline='') as outfile:
-    for i, line in enumerate(infile):
-        if i != 1:  # Skip the second line (index 1)
+
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    with open(input_file, 'r') as infile, open(output_file, 'w', newline='') as outfile:
+        for i, line in enumerate(infile):
+            # Skip the second line (index 1) when it is the HXL tag row; chunked ingestion drops it already
+            if i == 1 and line.startswith('#'):
+                continue
             outfile.write(line)
 
-print(f"Cleaned file saved to: {cleaned_file_path}")
+    print(f"Cleaned file saved to: {output_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,92 @@
 
 import pandas as pd
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.energy_data_preprocess import COUNTRY_COLUMN, country_partitions
+from data_prep.long_store import partition_dir, reset_store, write_partition, write_store_manifest
+from data_prep.schema import COMPACT_SCHEMA, compact_long, compact_wide, memory_report
 
 # --- Configuration ---
 INPUT_FILE = os.path.join('data', 'processed_energy_data_final.csv')
 OUTPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+OUTPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')  # Columnar store read by the model scripts
+MAX_WORKERS = None  # Processes used for the per-country partitions; None means one per CPU
+
+
+def to_long(df, compact=COMPACT_SCHEMA):
+    """
+    Melt the wide (Country ISO3, Year) x Indicator table into Country ISO3, Year,
+    Indicator, Value rows. With compact set, the result uses the compact schema.
+    """
+    # --- Convert from Wide to Long Format ---
+    print("\n--- Converting data from wide to long format ---")
+    id_vars = [COUNTRY_COLUMN, 'Year'] if COUNTRY_COLUMN in df.columns else ['Year']
+    df_long = pd.melt(df, id_vars=id_vars, var_name='Indicator', value_name='Value')
+    # Cells still missing after imputation (the 'mask' strategy, or columns dropped for this country) are not observations
+    df_long = df_long.dropna(subset=['Value']).reset_index(drop=True)
+    return compact_long(df_long) if compact else df_long
+
+
+def convert_partition(df_country, country, store_dir, compact=COMPACT_SCHEMA):
+    """
+    to_long() for one country's wide rows, written as that country's store
+    partition (or as the whole store when country is None). Returns (long frame,
+    partition manifest).
+    """
+    df_long = to_long(df_country, compact)
+    return df_long, write_partition(df_long, store_dir if country is None else partition_dir(store_dir, country))
+
+
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE, output_store_dir=OUTPUT_STORE_DIR, compact=COMPACT_SCHEMA,
+         max_workers=MAX_WORKERS):
+    # --- Load the dataset ---
+    print(f"Loading data from {input_file}...")
+    try:
+        df = pd.read_csv(input_file)
+    except FileNotFoundError:
+        print(f"Error: The file {input_file} was not found. Please make sure you have run the previous scripts to create it.")
+        exit()
 
-# --- Load the dataset ---
-print(f"Loading data from {INPUT_FILE}...")
-try:
-    df = pd.read_csv(INPUT_FILE)
-except FileNotFoundError:
-    print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the previous scripts to create it.")
-    exit()
+    print("Dataset loaded successfully.")
+    print(f"Original shape of the dataset: {df.shape}")
+    if compact:
+        df = compact_wide(df)
+    memory_report('load', df)
 
-print("Dataset loaded successfully.")
-print(f"Original shape of the dataset: {df.shape}")
+    # Each country is melted and written as its store partition on its own, in a process pool when there are several
+    countries, df_partitions = zip(*country_partitions(df))
+    reset_store(output_store_dir)
+    if len(df_partitions) == 1:
+        results = [convert_partition(df_partitions[0], countries[0], output_store_dir, compact)]
+    else:
+        print(f"\nConverting {len(df_partitions)} countries in a process pool...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                convert_partition, df_partitions, countries, repeat(output_store_dir), repeat(compact)
+            ))
 
-# --- Convert from Wide to Long Format ---
-print("\n--- Converting data from wide to long format ---")
-df_long = pd.melt(df, id_vars=['Year'], var_name='Indicator', value_name='Value')
+    df_long = pd.concat([long_part for long_part, _ in results], ignore_index=True)
+    if compact:
+        # Categoricals with different categories per country concatenate as objects
+        df_long = compact_long(df_long)
+    print("Conversion complete.")
+    print(f"New shape of the dataset: {df_long.shape}")
+    memory_report('melt', df_long)
 
-print("Conversion complete.")
-print(f"New shape of the dataset: {df_long.shape}")
+    # --- Save the long format data ---
+    print(f"\n--- Saving long format data to {output_file} ---")
+    df_long.to_csv(output_file, index=False)
 
+    print(f"\n--- Saved columnar store to {output_store_dir} ---")
+    manifest = results[0][1] if countries[0] is None else \
+        write_store_manifest(output_store_dir, {country: part_manifest for country, (_, part_manifest) in zip(countries, results)})
+    print(f"Stored {manifest['rows']} rows across {len(manifest['indicators'])} indicators.")
+    print("Script finished successfully.")
 
-# --- Save the long format data ---
-print(f"\n--- Saving long format data to {OUTPUT_FILE} ---")
-df_long.to_csv(OUTPUT_FILE, index=False)
-print("Script finished successfully.")
 
+if __name__ == '__main__':
+    main()
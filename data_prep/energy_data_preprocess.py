@@ -1,72 +1,177 @@
 import pandas as pd
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 
-# Define the resources directory
-resources_dir = 'resources'
-
-# Get all CSV files from the resources directory
-csv_files = [f for f in os.listdir(resources_dir) if f.endswith('.csv')]
-
-# Check if any CSV files exist
-if not csv_files:
-    print(f"Error: No CSV files found in the '{resources_dir}' directory")
-    exit(1)
-
-print(f"Found {len(csv_files)} CSV files in '{resources_dir}':")
-for f in csv_files:
-    print(f"- {f}")
-
-try:
-    # Read all CSV files into a list of dataframes
-    data_frames = []
-    required_columns = {'Year', 'Indicator Name', 'Value'}
-    
-    for csv_file in csv_files:
-        file_path = os.path.join(resources_dir, csv_file)
-        df = pd.read_csv(file_path)
-        
-        # Check for required columns
-        missing_cols = required_columns - set(df.columns)
-        if missing_cols:
-            print(f"Error: {csv_file} is missing required columns: {', '.join(missing_cols)}")
-            exit(1)
-            
-        data_frames.append(df)
-    
-    # Combine all dataframes
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.schema import COMPACT_SCHEMA, YEAR_DTYPE, compact_wide, memory_report
+
+# --- Configuration ---
+RESOURCES_DIR = 'resources'
+OUTPUT_DIR = 'data'
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, 'processed_energy_data.csv')
+COUNTRY_COLUMN = 'Country ISO3'
+REQUIRED_COLUMNS = [COUNTRY_COLUMN, 'Year', 'Indicator Name', 'Value']
+GROUP_KEYS = [COUNTRY_COLUMN, 'Year', 'Indicator Name']
+CHUNKED_INGEST = True  # Read files in a worker pool, one chunk at a time
+CHUNK_SIZE = 100_000  # Rows per chunk; bounds the memory used by each worker
+MAX_WORKERS = None  # None lets the executor size the pool from the CPU count
+USE_PROCESSES = False  # Threads are enough for a few files; processes scale to large dumps
+
+
+def find_csv_files(resources_dir):
+    return sorted(os.path.join(resources_dir, f) for f in os.listdir(resources_dir) if f.endswith('.csv'))
+
+
+def missing_columns(file_path):
+    """Return the required columns absent from a file, reading only its header."""
+    header = pd.read_csv(file_path, nrows=0)
+    return set(REQUIRED_COLUMNS) - set(header.columns)
+
+
+def country_partitions(df):
+    """(country, frame) per country, in ISO3 order; a frame without a country column is one partition, keyed None."""
+    if COUNTRY_COLUMN not in df.columns:
+        return [(None, df)]
+    return [(country, part.reset_index(drop=True))
+            for country, part in df.groupby(COUNTRY_COLUMN, sort=True, observed=True)]
+
+
+def split_by_country(df):
+    """One frame per country, in ISO3 order; frames without a country column form a single partition."""
+    return [part for _, part in country_partitions(df)]
+
+
+def hxl_skiprows(file_path):
+    """HDX exports carry an HXL tag row (#country+name,...) right after the header."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        f.readline()
+        second_line = f.readline()
+    return [1] if second_line.startswith('#') else None
+
+
+def partial_aggregates(file_path, chunk_size=CHUNK_SIZE, compact=COMPACT_SCHEMA):
+    """
+    Reduce one file to per-(Country, Year, Indicator Name) sums, one chunk at a time.
+    In compact mode Year is parsed as int16 and the names as categoricals; sums stay float64.
+    """
+    dtype = {'Year': YEAR_DTYPE, 'Indicator Name': 'category', COUNTRY_COLUMN: 'category'} if compact else None
+    total = None
+    reader = pd.read_csv(
+        file_path,
+        usecols=REQUIRED_COLUMNS,
+        skiprows=hxl_skiprows(file_path),
+        chunksize=chunk_size,
+        dtype=dtype,
+    )
+    for chunk in reader:
+        chunk['Value'] = pd.to_numeric(chunk['Value'], errors='coerce')
+        partial = chunk.groupby(GROUP_KEYS, observed=True)['Value'].sum()
+        if total is None:
+            total = partial
+        else:
+            total = pd.concat([total, partial]).groupby(level=GROUP_KEYS, observed=True).sum()
+    return total
+
+
+def ingest_chunked(csv_files, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS, use_processes=USE_PROCESSES,
+                   compact=COMPACT_SCHEMA):
+    """Aggregate all files in a worker pool and pivot the combined partial sums."""
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as executor:
+        partials = list(executor.map(partial_aggregates, csv_files, repeat(chunk_size), repeat(compact)))
+
+    partials = [p for p in partials if p is not None]
+    if not partials:
+        return None
+
+    combined = pd.concat(partials).groupby(level=GROUP_KEYS, observed=True).sum()
+    return combined.unstack('Indicator Name').reset_index()
+
+
+def ingest_in_memory(csv_files):
+    """Original path: read every file whole, concatenate, then pivot."""
+    data_frames = [pd.read_csv(file_path, skiprows=hxl_skiprows(file_path)) for file_path in csv_files]
     if not data_frames:
-        print("Error: No valid data to process")
-        exit(1)
-    
+        return None
+
     df_all = pd.concat(data_frames, ignore_index=True)
-    
+
     # Ensure Value column is numeric, coerce errors to NaN
     df_all['Value'] = pd.to_numeric(df_all['Value'], errors='coerce')
-    
+
     # Pivot using sum as the aggregation function
-    df_wide = df_all.pivot_table(
-        index='Year',
+    return df_all.pivot_table(
+        index=[COUNTRY_COLUMN, 'Year'],
         columns='Indicator Name',
         values='Value',
         aggfunc='sum'  # Use sum instead of mean to handle potential non-numeric values
     ).reset_index()
-    
-    # Create data directory if it doesn't exist
-    output_dir = 'data'
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Save to CSV
-    output_file = os.path.join(output_dir, 'processed_energy_data.csv')
-    df_wide.to_csv(output_file, index=False)
-    
-    # Show results
-    print("\nPreview of processed data:")
-    print(df_wide.head())
-    print(f"\nData successfully saved to: {os.path.abspath(output_file)}")
-    
-except pd.errors.EmptyDataError:
-    print("Error: One or more files are empty.")
-    exit(1)
-except Exception as e:
-    print(f"An error occurred: {str(e)}")
-    exit(1)
+
+
+def ingest(resources_dir=RESOURCES_DIR, chunked=CHUNKED_INGEST, compact=COMPACT_SCHEMA):
+    """
+    Read every CSV in resources_dir and return the wide table: one row per
+    (Country ISO3, Year) and one column per indicator. Values of different
+    countries are never summed together.
+    """
+    # Get all CSV files from the resources directory
+    csv_files = find_csv_files(resources_dir)
+
+    # Check if any CSV files exist
+    if not csv_files:
+        print(f"Error: No CSV files found in the '{resources_dir}' directory")
+        exit(1)
+
+    print(f"Found {len(csv_files)} CSV files in '{resources_dir}':")
+    for f in csv_files:
+        print(f"- {os.path.basename(f)}")
+
+    # Check for required columns before reading any data
+    for file_path in csv_files:
+        missing_cols = missing_columns(file_path)
+        if missing_cols:
+            print(f"Error: {os.path.basename(file_path)} is missing required columns: {', '.join(missing_cols)}")
+            exit(1)
+
+    if chunked:
+        print(f"\nReading files in chunks of {CHUNK_SIZE} rows ({'processes' if USE_PROCESSES else 'threads'})...")
+        df_wide = ingest_chunked(csv_files, compact=compact)
+    else:
+        df_wide = ingest_in_memory(csv_files)
+
+    if df_wide is None:
+        print("Error: No valid data to process")
+        exit(1)
+    if compact:
+        df_wide = compact_wide(df_wide)
+    memory_report('ingest', df_wide)
+    return df_wide
+
+
+def main(resources_dir=RESOURCES_DIR, output_file=OUTPUT_FILE, compact=COMPACT_SCHEMA):
+    try:
+        df_wide = ingest(resources_dir, compact=compact)
+
+        # Create data directory if it doesn't exist
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+
+        # Save to CSV
+        df_wide.to_csv(output_file, index=False)
+
+        # Show results
+        print("\nPreview of processed data:")
+        print(df_wide.head())
+        print(f"\nData successfully saved to: {os.path.abspath(output_file)}")
+
+    except pd.errors.EmptyDataError:
+        print("Error: One or more files are empty.")
+        exit(1)
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
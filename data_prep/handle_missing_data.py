@@ -1,51 +1,153 @@
 
+import numpy as np
 import pandas as pd
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.energy_data_preprocess import COUNTRY_COLUMN
+from data_prep.imputation import DEFAULT_STRATEGY, impute_matrix, missingness
+from data_prep.schema import COMPACT_SCHEMA, compact_wide, memory_report
 
 # --- Configuration ---
 INPUT_FILE = os.path.join('data', 'processed_energy_data_cleaned.csv')
 OUTPUT_FILE = os.path.join('data', 'processed_energy_data_final.csv')
 MISSING_VALUE_THRESHOLD = 0.5  # Drop columns with more than 50% missing values
+DEFAULT_IMPUTATION_STRATEGY = DEFAULT_STRATEGY  # ffill_bfill, ffill, bfill, linear, spline or mask
+IMPUTATION_STRATEGIES = {
+    # Per-indicator overrides, e.g.
+    # 'Access to electricity (% of population)': 'linear',
+}
+ID_COLUMNS = [COUNTRY_COLUMN, 'Year']
+
+
+def indicator_columns(df):
+    return [col for col in df.columns if col not in ID_COLUMNS]
+
+
+def assess_missing(df):
+    """Missing-value statistics of one country's indicator columns; pass them on to drop_sparse() and impute()."""
+    # --- Step 1: Assess Missing Data ---
+    print("\n--- Assessing missing data ---")
+    columns = indicator_columns(df)
+    stats = missingness(df[columns].to_numpy(dtype=float))
+    stats['columns'] = pd.Index(columns)
+    return stats
+
+
+def drop_sparse(df, missing_value_threshold=MISSING_VALUE_THRESHOLD, stats=None):
+    """Drop the columns whose share of missing values is above the threshold. Expects a single country."""
+    stats = stats if stats is not None else assess_missing(df)
+
+    # --- Step 2: Drop Columns with High Missingness ---
+    print(f"\n--- Dropping columns with more than {missing_value_threshold:.0%} missing values ---")
+    cols_to_drop = stats['columns'][stats['share'] > missing_value_threshold]
+    return df.drop(columns=cols_to_drop)
+
+
+def impute(df, strategies=IMPUTATION_STRATEGIES, default_strategy=DEFAULT_IMPUTATION_STRATEGY, stats=None):
+    """
+    Fill gaps along Year with each indicator's strategy (default_strategy unless
+    listed in strategies), in one vectorized pass over the Year x Indicator
+    matrix. Expects a single country; stats from assess_missing() are reused
+    when given.
+    """
+    # --- Step 3: Impute Remaining Missing Values ---
+    print("\n--- Imputing remaining missing values ---")
+    # Rows must be in year order for the fill directions to mean anything
+    if not df['Year'].is_monotonic_increasing:
+        df = df.sort_values(by='Year')
+        stats = None
+    df = df.reset_index(drop=True)
+
+    columns = indicator_columns(df)
+    if stats is not None:
+        positions = stats['columns'].get_indexer(columns)
+        stats = {'missing': stats['missing'][:, positions]}
+
+    column_strategies = [strategies.get(col, default_strategy) for col in columns]
+    filled, imputed = impute_matrix(
+        df[columns].to_numpy(), column_strategies, years=df['Year'].to_numpy(), stats=stats
+    )
+    print(f"Imputed {int(imputed.sum())} values; {int(np.isnan(filled).sum())} left missing.")
+
+    df_imputed = df.copy()
+    df_imputed[columns] = filled
+    return df_imputed
+
+
+def impute_countries(df, missing_value_threshold=MISSING_VALUE_THRESHOLD, strategies=IMPUTATION_STRATEGIES,
+                     default_strategy=DEFAULT_IMPUTATION_STRATEGY):
+    """
+    drop_sparse() and impute() for every country at once. The wide rows are laid
+    out as one (country x year x indicator) block and filled by a single
+    impute_matrix() call; years a country has no row for are left out of its
+    missing shares and of the result. A column dropped for a country is left
+    empty for it, and one dropped for every country is removed.
+    """
+    df = df.sort_values([column for column in ID_COLUMNS if column in df.columns], kind='stable').reset_index(drop=True)
+    columns = indicator_columns(df)
+    if COUNTRY_COLUMN in df.columns:
+        country_rows, countries = pd.factorize(df[COUNTRY_COLUMN], sort=True)
+    else:
+        country_rows, countries = np.zeros(len(df), dtype=np.intp), [None]
+    year_rows, years = pd.factorize(df['Year'], sort=True)
+
+    values = df[columns].to_numpy()
+    block = np.full((len(countries), len(years), len(columns)), np.nan,
+                    dtype=np.float32 if values.dtype == np.float32 else float)
+    block[country_rows, year_rows] = values
+    present = np.zeros((len(countries), len(years), 1), dtype=bool)
+    present[country_rows, year_rows] = True
 
-# --- Load the dataset ---
-print(f"Loading data from {INPUT_FILE}...")
-try:
-    df = pd.read_csv(INPUT_FILE)
-except FileNotFoundError:
-    print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the previous script to create it.")
-    exit()
+    # --- Steps 1 and 2: Assess Missing Data and Drop Columns with High Missingness ---
+    print(f"\n--- Dropping columns with more than {missing_value_threshold:.0%} missing values in each country ---")
+    stats = missingness(block)
+    share = (stats['missing'] & present).sum(axis=1) / present.sum(axis=1)
+    dropped = share > missing_value_threshold
+    for country, count in zip(countries, dropped.sum(axis=1)):
+        print(f"Dropped {int(count)} columns{f' for {country}' if country is not None else ''}.")
 
-print("Dataset loaded successfully.")
-print(f"Original shape of the dataset: {df.shape}")
+    # --- Step 3: Impute Remaining Missing Values ---
+    print("\n--- Imputing remaining missing values ---")
+    column_strategies = [strategies.get(col, default_strategy) for col in columns]
+    filled, imputed = impute_matrix(block, column_strategies, years=np.asarray(years), stats=stats)
+    filled[np.broadcast_to(dropped[:, None, :], filled.shape)] = np.nan
+    imputed &= present & ~dropped[:, None, :]
+    print(f"Imputed {int(imputed.sum())} values; {int((np.isnan(filled) & present & ~dropped[:, None, :]).sum())} left missing.")
 
-# --- Step 1: Assess Missing Data ---
-print("\n--- Assessing missing data ---")
-missing_percentage = df.isnull().sum() / len(df)
+    df_imputed = df.copy()
+    df_imputed[columns] = filled[country_rows, year_rows]
+    return df_imputed.drop(columns=[col for col, gone in zip(columns, dropped.all(axis=0)) if gone])
 
-# --- Step 2: Drop Columns with High Missingness ---
-print(f"\n--- Dropping columns with more than {MISSING_VALUE_THRESHOLD:.0%} missing values ---")
-cols_to_drop = missing_percentage[missing_percentage > MISSING_VALUE_THRESHOLD].index
-df_dropped = df.drop(columns=cols_to_drop)
 
-print(f"Dropped {len(cols_to_drop)} columns.")
-print(f"New shape of the dataset: {df_dropped.shape}")
+def main(input_file=INPUT_FILE, output_file=OUTPUT_FILE, missing_value_threshold=MISSING_VALUE_THRESHOLD,
+         compact=COMPACT_SCHEMA):
+    # --- Load the dataset ---
+    print(f"Loading data from {input_file}...")
+    try:
+        df = pd.read_csv(input_file)
+    except FileNotFoundError:
+        print(f"Error: The file {input_file} was not found. Please make sure you have run the previous script to create it.")
+        exit()
 
-# --- Step 3: Impute Remaining Missing Values ---
-print("\n--- Imputing remaining missing values using forward fill ---")
-# First, sort by year to ensure correct forward fill
-df_dropped = df_dropped.sort_values(by='Year').reset_index(drop=True)
-df_imputed = df_dropped.ffill()
+    print("Dataset loaded successfully.")
+    print(f"Original shape of the dataset: {df.shape}")
+    if compact:
+        df = compact_wide(df)
+    memory_report('load', df)
 
-# Check if there are any remaining missing values (for columns that had missing values at the beginning)
-remaining_missing = df_imputed.isnull().sum().sum()
-if remaining_missing > 0:
-    print(f"There are still {remaining_missing} missing values. Applying backfill to handle these cases.")
-    df_imputed = df_imputed.bfill()
+    # Countries are the block's leading axis, so one country's gaps never affect another's
+    df_imputed = impute_countries(df, missing_value_threshold)
+    print(f"New shape of the dataset: {df_imputed.shape}")
+    print("Imputation complete.")
+    memory_report('impute', df_imputed)
 
+    # --- Save the cleaned data ---
+    print(f"\n--- Saving cleaned data to {output_file} ---")
+    df_imputed.to_csv(output_file, index=False)
+    print("Script finished successfully.")
 
-print("Imputation complete.")
 
-# --- Save the cleaned data ---
-print(f"\n--- Saving cleaned data to {OUTPUT_FILE} ---")
-df_imputed.to_csv(OUTPUT_FILE, index=False)
-print("Script finished successfully.")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import numpy as np
+
+# --- Configuration ---
+DEFAULT_STRATEGY = 'ffill_bfill'  # What handle_missing_data.py has always done
+YEAR_AXIS = -2  # Blocks are (..., years, indicators); a leading axis can hold countries
+
+# Every strategy fills a whole block of columns at once. It receives the values,
+# the row of the previous and next observed value for every cell (-1 and n_years
+# when there is none) and the year of every row, shaped to broadcast as (years, 1).
+
+
+def _take(values, rows):
+    return np.take_along_axis(values, np.clip(rows, 0, values.shape[YEAR_AXIS] - 1), axis=YEAR_AXIS)
+
+
+def _ffill(values, prev, nxt, years):
+    return np.where(prev >= 0, _take(values, prev), np.nan)
+
+
+def _bfill(values, prev, nxt, years):
+    return np.where(nxt < values.shape[YEAR_AXIS], _take(values, nxt), np.nan)
+
+
+def _ffill_bfill(values, prev, nxt, years):
+    filled = _ffill(values, prev, nxt, years)
+    return np.where(np.isnan(filled), _bfill(values, prev, nxt, years), filled)
+
+
+def _linear(values, prev, nxt, years):
+    """Interpolate on Year between the surrounding observations; hold the nearest value beyond them, like np.interp."""
+    n_years = values.shape[YEAR_AXIS]
+    has_prev = prev >= 0
+    has_next = nxt < n_years
+    year_grid = np.broadcast_to(years, values.shape)
+    prev_years = _take(year_grid, prev)
+    next_years = _take(year_grid, nxt)
+    prev_values = _take(values, prev)
+    next_values = _take(values, nxt)
+
+    span = np.where(next_years > prev_years, next_years - prev_years, 1)
+    weight = (year_grid - prev_years) / span
+    inner = prev_values + weight * (next_values - prev_values)
+    return np.where(has_prev & has_next, inner, np.where(has_prev, prev_values, np.where(has_next, next_values, np.nan)))
+
+
+def _spline_second_derivatives(x, y, counts):
+    """
+    Second derivatives at the knots of natural cubic splines, one per row of x
+    and y (knots packed to the left, counts[r] >= 3 of them in row r). The
+    tridiagonal systems are padded to one size and solved together by the Thomas
+    algorithm, so the Python loop runs over knots, not over rows.
+    """
+    h = np.diff(x, axis=1)
+    h = np.where(np.arange(h.shape[1]) < (counts - 1)[:, None], h, 1.0)
+    slopes = np.diff(y, axis=1) / h
+    # Equation j is for knot j + 1; padding equations read 1 * 0 = 0 and are coupled to nothing
+    equation = np.arange(x.shape[1] - 2)
+    real = equation < (counts - 2)[:, None]
+    diag = np.where(real, 2 * (h[:, :-1] + h[:, 1:]), 1.0)
+    off = np.where(equation[:-1] < (counts - 3)[:, None], h[:, 1:-1], 0.0)  # Symmetric: below and above diag
+    rhs = np.where(real, 6 * (slopes[:, 1:] - slopes[:, :-1]), 0.0)
+    for j in range(1, len(equation)):
+        weight = off[:, j - 1] / diag[:, j - 1]
+        diag[:, j] -= weight * off[:, j - 1]
+        rhs[:, j] -= weight * rhs[:, j - 1]
+    second = np.zeros(x.shape)
+    second[:, -2] = rhs[:, -1] / diag[:, -1]
+    for j in range(len(equation) - 2, -1, -1):
+        second[:, j + 1] = (rhs[:, j] - off[:, j] * second[:, j + 2]) / diag[:, j]
+    return second
+
+
+def _spline(values, prev, nxt, years):
+    """
+    Natural cubic spline on Year through each column's observations for the gaps
+    between them; beyond them, and in columns with fewer than three observations,
+    the same as linear. The splines of all columns are fitted together.
+    """
+    filled = _linear(values, prev, nxt, years)
+    gaps = np.isnan(values) & (prev >= 0) & (nxt < values.shape[YEAR_AXIS])
+    # One row per column (of every country), years along the last axis
+    rows = np.moveaxis(values, YEAR_AXIS, -1).reshape(-1, values.shape[YEAR_AXIS])
+    row_gaps = np.moveaxis(gaps, YEAR_AXIS, -1).reshape(rows.shape)
+    out = np.moveaxis(filled, YEAR_AXIS, -1).reshape(rows.shape)
+    observed = ~np.isnan(rows)
+    counts = observed.sum(axis=1)
+    splined = np.flatnonzero(row_gaps.any(axis=1) & (counts >= 3))
+    if len(splined) == 0:
+        return filled
+
+    # Each row's observations packed to the left as the knots; padding knots are never read
+    years = np.asarray(years, dtype=float).ravel()
+    order = np.argsort(~observed[splined], axis=1, kind='stable')
+    x = years[order]
+    y = np.nan_to_num(np.take_along_axis(rows[splined].astype(float), order, axis=1))
+    second = _spline_second_derivatives(x, y, counts[splined])
+
+    # A gap lies between knots i and i + 1, i + 1 being the number of observations before it
+    r, t = np.nonzero(row_gaps[splined])
+    i = np.cumsum(observed[splined], axis=1)[r, t] - 1
+    h = x[r, i + 1] - x[r, i]
+    left, right = years[t] - x[r, i], x[r, i + 1] - years[t]
+    out[splined[r], t] = ((second[r, i] * right ** 3 + second[r, i + 1] * left ** 3) / (6 * h)
+                          + (y[r, i] / h - second[r, i] * h / 6) * right
+                          + (y[r, i + 1] / h - second[r, i + 1] * h / 6) * left)
+    return np.moveaxis(out.reshape(np.moveaxis(filled, YEAR_AXIS, -1).shape), -1, YEAR_AXIS)
+
+
+def _mask(values, prev, nxt, years):
+    """Leave gaps missing; the long format drops these rows so models only see observed years."""
+    return values
+
+
+STRATEGIES = {
+    'ffill_bfill': _ffill_bfill,
+    'ffill': _ffill,
+    'bfill': _bfill,
+    'linear': _linear,
+    'spline': _spline,
+    'mask': _mask,
+}
+
+
+def register_strategy(name, func):
+    """Add a strategy; func(values, prev, nxt, years) must fill a whole block of columns."""
+    STRATEGIES[name] = func
+
+
+def missingness(values):
+    """Missing-value statistics of a (..., years, indicators) block, computed once and shared by drop and impute."""
+    missing = np.isnan(values)
+    count = missing.sum(axis=YEAR_AXIS)
+    return {'missing': missing, 'count': count, 'share': count / values.shape[YEAR_AXIS]}
+
+
+def neighbours(missing):
+    """Row of the previous and next observed value for every cell, via running max/min over row numbers."""
+    n_years = missing.shape[YEAR_AXIS]
+    rows = np.arange(n_years).reshape(-1, 1)
+
+    prev = np.where(missing, -1, rows)
+    np.maximum.accumulate(prev, axis=YEAR_AXIS, out=prev)
+
+    nxt = np.flip(np.where(missing, n_years, rows), axis=YEAR_AXIS)
+    nxt = np.flip(np.minimum.accumulate(nxt, axis=YEAR_AXIS), axis=YEAR_AXIS)
+    return prev, nxt
+
+
+def impute_matrix(values, column_strategies, years=None, stats=None):
+    """
+    Fill a (..., years, indicators) block, with rows sorted by year. column_strategies
+    names the strategy of each indicator column; each strategy runs once over all
+    of its columns. Returns (filled values, mask of the cells that were imputed).
+    float32 blocks (the compact schema) are filled in float32; anything else in float64.
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        values = values.astype(float)
+    stats = stats if stats is not None else missingness(values)
+    if years is None:
+        years = np.arange(values.shape[YEAR_AXIS])
+    years = np.asarray(years, dtype=float).reshape(-1, 1)
+
+    unknown = set(column_strategies) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown imputation strategies: {', '.join(sorted(unknown))}")
+
+    prev, nxt = neighbours(stats['missing'])
+    filled = values.copy()
+    column_strategies = np.asarray(column_strategies)
+    for name in np.unique(column_strategies):
+        cols = column_strategies == name
+        filled[..., cols] = STRATEGIES[name](values[..., cols], prev[..., cols], nxt[..., cols], years)
+
+    imputed = stats['missing'] & ~np.isnan(filled)
+    return filled, imputed
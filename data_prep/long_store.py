@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_prep.schema import COMPACT_SCHEMA, YEAR_DTYPE, compact_long, memory_report
+
+# --- Configuration ---
+CSV_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+MANIFEST_FILE = 'manifest.json'
+STORE_FORMAT_VERSION = 2
+COUNTRY_COLUMN = 'Country ISO3'
+
+# Layout: one partition directory per country (country=PHL/, ...) and a top-level
+# manifest listing them. Each partition holds one .npy file per column plus its own
+# manifest. Rows in a partition are sorted by (Indicator, Year) so every indicator
+# is a contiguous row range, and Indicator is stored as integer codes into the
+# manifest's dictionary of names. Readers memory-map the column files and slice
+# out only the range they need. A store written from a frame without a country
+# column is a single unpartitioned directory (format version 1). Years are stored
+# as int16; values keep their float32 or float64 dtype, which np.load restores.
+
+
+def partition_dir(store_dir, country):
+    return os.path.join(store_dir, f'country={country}')
+
+
+def reset_store(store_dir=STORE_DIR):
+    """Remove a previous store so partitions of countries no longer present do not linger."""
+    if os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+
+
+def write_partition(df_long, part_dir):
+    """Write one country's (Year, Indicator, Value) rows as a columnar partition."""
+    os.makedirs(part_dir, exist_ok=True)
+
+    indicator = df_long['Indicator'].astype('category')
+    indicators = [str(name) for name in indicator.cat.categories]
+    codes = indicator.cat.codes.to_numpy()
+
+    order = np.lexsort((df_long['Year'].to_numpy(), codes))
+    codes = codes[order].astype(np.min_scalar_type(len(indicators)))
+    years = df_long['Year'].to_numpy()[order].astype(YEAR_DTYPE)
+    values = df_long['Value'].to_numpy()[order]
+    if values.dtype != np.float32:
+        values = values.astype(np.float64)
+
+    # Start/stop row of each indicator; codes are sorted so searchsorted finds them
+    starts = np.searchsorted(codes, np.arange(len(indicators)), side='left')
+    stops = np.searchsorted(codes, np.arange(len(indicators)), side='right')
+
+    columns = {'Year': 'year.npy', 'Indicator': 'indicator.npy', 'Value': 'value.npy'}
+    np.save(os.path.join(part_dir, columns['Year']), years)
+    np.save(os.path.join(part_dir, columns['Indicator']), codes)
+    np.save(os.path.join(part_dir, columns['Value']), values)
+
+    manifest = {
+        'format_version': 1,
+        'rows': int(len(years)),
+        'columns': columns,
+        'indicators': indicators,
+        'ranges': {name: [int(start), int(stop)] for name, start, stop in zip(indicators, starts, stops)},
+    }
+    with open(os.path.join(part_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def write_store_manifest(store_dir, partition_manifests):
+    """Top-level manifest for a partitioned store, from {country: partition manifest}."""
+    manifest = {
+        'format_version': STORE_FORMAT_VERSION,
+        'rows': sum(m['rows'] for m in partition_manifests.values()),
+        'partitions': {
+            country: {'path': os.path.basename(partition_dir(store_dir, country)), 'rows': m['rows']}
+            for country, m in sorted(partition_manifests.items())
+        },
+        'indicators': sorted({name for m in partition_manifests.values() for name in m['indicators']}),
+    }
+    with open(os.path.join(store_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def write_long_store(df_long, store_dir=STORE_DIR):
+    """Write a long-format frame as a columnar store, partitioned by Country ISO3 when present."""
+    reset_store(store_dir)
+    if COUNTRY_COLUMN not in df_long.columns:
+        return write_partition(df_long, store_dir)
+
+    partition_manifests = {
+        country: write_partition(df_country, partition_dir(store_dir, country))
+        for country, df_country in df_long.groupby(COUNTRY_COLUMN, sort=True, observed=True)
+    }
+    return write_store_manifest(store_dir, partition_manifests)
+
+
+def store_exists(store_dir=STORE_DIR):
+    return os.path.exists(os.path.join(store_dir, MANIFEST_FILE))
+
+
+def read_manifest(store_dir=STORE_DIR):
+    with open(os.path.join(store_dir, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+
+def partitions(store_dir=STORE_DIR, manifest=None):
+    """{country: (partition directory, partition manifest)}; an unpartitioned store maps None to itself."""
+    manifest = manifest or read_manifest(store_dir)
+    if 'partitions' not in manifest:
+        return {None: (store_dir, manifest)}
+    result = {}
+    for country, entry in manifest['partitions'].items():
+        part_dir = os.path.join(store_dir, entry['path'])
+        result[country] = (part_dir, read_manifest(part_dir))
+    return result
+
+
+def open_columns(part_dir, manifest=None):
+    """Memory-map every column of a partition; nothing is read until it is sliced."""
+    manifest = manifest or read_manifest(part_dir)
+    return {
+        name: np.load(os.path.join(part_dir, file_name), mmap_mode='r')
+        for name, file_name in manifest['columns'].items()
+    }
+
+
+def _to_frame(columns, indicators, rows=slice(None)):
+    return pd.DataFrame({
+        'Year': np.asarray(columns['Year'][rows]),
+        'Indicator': pd.Categorical.from_codes(np.asarray(columns['Indicator'][rows]), categories=indicators),
+        'Value': np.asarray(columns['Value'][rows]),
+    })
+
+
+def load_long_store(store_dir=STORE_DIR):
+    """Load the whole store as one frame with a categorical Indicator column."""
+    frames = []
+    for country, (part_dir, manifest) in partitions(store_dir).items():
+        df_part = _to_frame(open_columns(part_dir, manifest), manifest['indicators'])
+        if country is not None:
+            df_part.insert(0, COUNTRY_COLUMN, country)
+        frames.append(df_part)
+    df_long = pd.concat(frames, ignore_index=True)
+    if COUNTRY_COLUMN in df_long.columns:
+        df_long[COUNTRY_COLUMN] = df_long[COUNTRY_COLUMN].astype('category')
+    memory_report('load_long_store', df_long)
+    return df_long
+
+
+def list_indicators(store_dir=STORE_DIR, csv_file=CSV_FILE):
+    """Indicator names from the store's dictionary, or from the CSV when there is no store."""
+    if store_exists(store_dir):
+        return list(read_manifest(store_dir)['indicators'])
+    return list(pd.read_csv(csv_file, usecols=['Indicator'])['Indicator'].unique())
+
+
+def _single_country(countries):
+    if len(countries) != 1:
+        raise ValueError(f"The data holds {len(countries)} countries; pass country= to pick one.")
+    return countries[0]
+
+
+def load_indicator(indicator, store_dir=STORE_DIR, csv_file=CSV_FILE, country=None):
+    """
+    Rows for one indicator of one country, sorted by Year. Reads only that
+    indicator's row range from the country's partition; falls back to filtering
+    the long CSV when the store is missing. country may be omitted when the data
+    holds a single country.
+    """
+    if not store_exists(store_dir):
+        df_long = pd.read_csv(csv_file)
+        mask = df_long['Indicator'] == indicator
+        if COUNTRY_COLUMN in df_long.columns:
+            country = country or _single_country(list(df_long[COUNTRY_COLUMN].unique()))
+            mask &= df_long[COUNTRY_COLUMN] == country
+        df_indicator = df_long.loc[mask, ['Year', 'Indicator', 'Value']]
+        df_indicator = df_indicator.sort_values('Year').reset_index(drop=True)
+        return compact_long(df_indicator) if COMPACT_SCHEMA else df_indicator
+
+    store_partitions = partitions(store_dir)
+    if country is None:
+        country = _single_country(list(store_partitions))
+    part_dir, manifest = store_partitions.get(country, (None, None))
+    if part_dir is None:
+        empty = {'Year': np.empty(0, YEAR_DTYPE), 'Indicator': np.empty(0, np.int8), 'Value': np.empty(0)}
+        return _to_frame(empty, [])
+
+    start, stop = manifest['ranges'].get(indicator, (0, 0))
+    return _to_frame(open_columns(part_dir, manifest), manifest['indicators'], slice(start, stop))
@@ -0,0 +1,137 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.energy_data_preprocess import country_partitions, find_csv_files, ingest
+from data_prep.handle_missing_data import assess_missing, drop_sparse, impute
+from data_prep.convert_to_long import to_long
+from data_prep.long_store import partition_dir, reset_store, write_partition, write_store_manifest
+from data_prep.series_index import SeriesIndex
+from data_prep.schema import COMPACT_SCHEMA, compact_long, memory_report
+
+# --- Configuration ---
+RESOURCES_DIR = 'resources'
+MISSING_VALUE_THRESHOLD = 0.5  # Drop columns with more than 50% missing values
+OUTPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+OUTPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+MAX_WORKERS = None  # Processes used for the per-country partitions; None means one per CPU
+
+# Results of prepare() in this process, keyed by the raw files' paths, sizes and
+# mtimes plus the parameters. Callers share the cached frame and must not modify it.
+_PREPARED = {}
+_INDEXES = {}
+
+
+def _cache_key(resources_dir, missing_value_threshold, compact=COMPACT_SCHEMA):
+    files = tuple(
+        (path, os.stat(path).st_size, os.stat(path).st_mtime_ns)
+        for path in find_csv_files(resources_dir)
+    )
+    return files, missing_value_threshold, compact
+
+
+def prepare_partition(df_country, missing_value_threshold=MISSING_VALUE_THRESHOLD, store_dir=None,
+                      compact=COMPACT_SCHEMA, country=None):
+    """
+    drop_sparse -> impute -> to_long for one country's wide rows. With store_dir
+    set, the long rows are also written as the store partition of country (the
+    partition key, so a country left without rows still gets its partition), or
+    as the whole store when country is None. Returns (imputed wide frame, long
+    frame, partition manifest or None).
+    """
+    stats = assess_missing(df_country)
+    df_imputed = impute(drop_sparse(df_country, missing_value_threshold, stats), stats=stats)
+    df_long = to_long(df_imputed, compact)
+
+    manifest = None
+    if store_dir is not None:
+        manifest = write_partition(df_long, store_dir if country is None else partition_dir(store_dir, country))
+    return df_imputed, df_long, manifest
+
+
+def prepare(resources_dir=RESOURCES_DIR, missing_value_threshold=MISSING_VALUE_THRESHOLD, debug_dir=None,
+            store_dir=None, use_cache=True, max_workers=MAX_WORKERS, compact=COMPACT_SCHEMA):
+    """
+    Run ingest -> drop_sparse -> impute -> to_long in one process, passing frames
+    between steps instead of CSV files. Returns the long (Country ISO3, Year,
+    Indicator, Value) frame.
+
+    The wide table is split by Country ISO3 and each country is prepared on its own
+    in a process pool. With store_dir set, each worker writes its country's
+    partition of the columnar store. With debug_dir set, every intermediate table
+    is also written there under the same names the script pipeline uses (there is
+    no separate cleaned file, since ingest() already skips the HXL row). compact
+    carries the compact schema (see schema.py) through every step.
+    """
+    key = _cache_key(resources_dir, missing_value_threshold, compact)
+    writes_files = debug_dir is not None or store_dir is not None
+    if use_cache and not writes_files and key in _PREPARED:
+        return _PREPARED[key]
+
+    df_wide = ingest(resources_dir, compact=compact)
+    countries, df_partitions = zip(*country_partitions(df_wide))
+    if store_dir is not None:
+        reset_store(store_dir)
+
+    if len(df_partitions) == 1:
+        results = [prepare_partition(df_partitions[0], missing_value_threshold, store_dir, compact, countries[0])]
+    else:
+        print(f"\nPreparing {len(df_partitions)} countries in a process pool...")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                prepare_partition, df_partitions, repeat(missing_value_threshold), repeat(store_dir), repeat(compact),
+                countries
+            ))
+
+    df_long = pd.concat([long_part for _, long_part, _ in results], ignore_index=True)
+    if compact:
+        df_long = compact_long(df_long)
+    memory_report('prepare', df_long)
+
+    if store_dir is not None and countries[0] is not None:
+        write_store_manifest(store_dir, {country: manifest for country, (_, _, manifest) in zip(countries, results)})
+
+    if debug_dir is not None:
+        os.makedirs(debug_dir, exist_ok=True)
+        df_imputed = pd.concat([imputed for imputed, _, _ in results], ignore_index=True)
+        df_wide.to_csv(os.path.join(debug_dir, 'processed_energy_data.csv'), index=False)
+        df_imputed.to_csv(os.path.join(debug_dir, 'processed_energy_data_final.csv'), index=False)
+        df_long.to_csv(os.path.join(debug_dir, 'processed_energy_data_long.csv'), index=False)
+        print(f"Intermediate tables written to {debug_dir}")
+
+    if use_cache:
+        _PREPARED[key] = df_long
+    return df_long
+
+
+def prepare_index(resources_dir=RESOURCES_DIR, missing_value_threshold=MISSING_VALUE_THRESHOLD, compact=COMPACT_SCHEMA):
+    """SeriesIndex over prepare()'s result, built once per set of raw files."""
+    key = _cache_key(resources_dir, missing_value_threshold, compact)
+    index = _INDEXES.get(key)
+    if index is None:
+        index = SeriesIndex.from_frame(prepare(resources_dir, missing_value_threshold, compact=compact))
+        _INDEXES[key] = index
+    return index
+
+
+def prepare_indicator(indicator, country=None, **kwargs):
+    """Rows for one indicator from prepare(), sorted by Year; mirrors long_store.load_indicator."""
+    return prepare_index(**kwargs).frame(indicator, country)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the whole data preparation chain in memory.")
+    parser.add_argument('--debug-dir', default=None, help="Also write every intermediate table to this directory.")
+    parser.add_argument('--compact', action='store_true', default=COMPACT_SCHEMA,
+                        help="Use the compact schema: int16 Year, categorical names, float32 values where they fit.")
+    args = parser.parse_args()
+
+    df_long = prepare(debug_dir=args.debug_dir, store_dir=OUTPUT_STORE_DIR, use_cache=False, compact=args.compact)
+    print(f"\n--- Saved columnar store to {OUTPUT_STORE_DIR}; saving long format data to {OUTPUT_FILE} ---")
+    df_long.to_csv(OUTPUT_FILE, index=False)
+    print("Script finished successfully.")
@@ -0,0 +1,205 @@
+import argparse
+import glob
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from graphlib import TopologicalSorter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.schema import COMPACT_SCHEMA
+
+# --- Configuration ---
+RESOURCES_DIR = 'resources'
+DATA_DIR = 'data'
+STATE_FILE = os.path.join(DATA_DIR, '.pipeline_state.json')
+PROCESSED_FILE = os.path.join(DATA_DIR, 'processed_energy_data.csv')
+CLEANED_FILE = os.path.join(DATA_DIR, 'processed_energy_data_cleaned.csv')
+FINAL_FILE = os.path.join(DATA_DIR, 'processed_energy_data_final.csv')
+LONG_FILE = os.path.join(DATA_DIR, 'processed_energy_data_long.csv')
+LONG_STORE_DIR = os.path.join(DATA_DIR, 'processed_energy_data_long')
+MISSING_VALUE_THRESHOLD = 0.5  # Drop columns with more than 50% missing values
+SCHEMA_FILE = os.path.join('data_prep', 'schema.py')
+
+# Each stage runs `module.main(**params)`. `inputs` are files (or globs) the stage
+# reads, `outputs` what it writes, and `code` any extra source files it depends on
+# besides its own module. Stage order is derived from matching inputs to outputs.
+STAGES = [
+    {
+        'name': 'preprocess',
+        'module': 'data_prep.energy_data_preprocess',
+        'code': [SCHEMA_FILE],
+        'inputs': [os.path.join(RESOURCES_DIR, '*.csv')],
+        'outputs': [PROCESSED_FILE],
+        'params': {'resources_dir': RESOURCES_DIR, 'output_file': PROCESSED_FILE, 'compact': COMPACT_SCHEMA},
+    },
+    {
+        'name': 'clean',
+        'module': 'data_prep.clean_data',
+        'inputs': [PROCESSED_FILE],
+        'outputs': [CLEANED_FILE],
+        'params': {'input_file': PROCESSED_FILE, 'output_file': CLEANED_FILE},
+    },
+    {
+        'name': 'handle_missing',
+        'module': 'data_prep.handle_missing_data',
+        'code': [
+            os.path.join('data_prep', 'imputation.py'),
+            os.path.join('data_prep', 'energy_data_preprocess.py'),
+            SCHEMA_FILE,
+        ],
+        'inputs': [CLEANED_FILE],
+        'outputs': [FINAL_FILE],
+        'params': {
+            'input_file': CLEANED_FILE,
+            'output_file': FINAL_FILE,
+            'missing_value_threshold': MISSING_VALUE_THRESHOLD,
+            'compact': COMPACT_SCHEMA,
+        },
+    },
+    {
+        'name': 'convert_to_long',
+        'module': 'data_prep.convert_to_long',
+        'code': [
+            os.path.join('data_prep', 'long_store.py'),
+            os.path.join('data_prep', 'energy_data_preprocess.py'),
+            SCHEMA_FILE,
+        ],
+        'inputs': [FINAL_FILE],
+        'outputs': [LONG_FILE, LONG_STORE_DIR],
+        'params': {
+            'input_file': FINAL_FILE,
+            'output_file': LONG_FILE,
+            'output_store_dir': LONG_STORE_DIR,
+            'compact': COMPACT_SCHEMA,
+        },
+    },
+]
+
+
+def load_state(state_file=STATE_FILE):
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'files': {}, 'stages': {}}
+
+
+def save_state(state, state_file=STATE_FILE):
+    os.makedirs(os.path.dirname(state_file) or '.', exist_ok=True)
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+
+def file_digest(path, state):
+    """
+    SHA-256 of a file's contents. The digest is cached against the file's size and
+    mtime, so unchanged files are only stat()-ed on later runs.
+    """
+    stat = os.stat(path)
+    cached = state['files'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+    state['files'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return digest
+
+
+def expand(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return paths
+
+
+def code_files(stage):
+    module_file = importlib.util.find_spec(stage['module']).origin
+    return [os.path.relpath(module_file)] + stage.get('code', [])
+
+
+def stage_fingerprint(stage, state):
+    """Hash of the stage's code, parameters and input contents."""
+    payload = {
+        'code': {path: file_digest(path, state) for path in code_files(stage)},
+        'params': stage['params'],
+        'inputs': {path: file_digest(path, state) for path in expand(stage['inputs'])},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def stage_order(stages):
+    """Topological order of the stages, using each stage's inputs to find its producers."""
+    producers = {output: stage['name'] for stage in stages for output in stage['outputs']}
+    graph = {
+        stage['name']: {producers[path] for path in stage['inputs'] if path in producers}
+        for stage in stages
+    }
+    by_name = {stage['name']: stage for stage in stages}
+    return [by_name[name] for name in TopologicalSorter(graph).static_order()]
+
+
+def run(stages=STAGES, force=False, dry_run=False, state_file=STATE_FILE):
+    start_time = time.perf_counter()
+    state = load_state(state_file)
+    ran, skipped = [], []
+    stale = set()
+
+    for stage in stage_order(stages):
+        name = stage['name']
+        producers = {output for s in stages if s['name'] in stale for output in s['outputs']}
+        upstream_stale = any(path in producers for path in stage['inputs'])
+
+        missing_inputs = [path for path in expand(stage['inputs']) if not os.path.exists(path)]
+        if missing_inputs and not (dry_run and upstream_stale):
+            print(f"Error: Stage '{name}' is missing inputs: {', '.join(missing_inputs)}")
+            exit(1)
+
+        fingerprint = None if upstream_stale and dry_run else stage_fingerprint(stage, state)
+        previous = state['stages'].get(name, {}).get('fingerprint')
+        outputs_exist = all(os.path.exists(path) for path in stage['outputs'])
+
+        if not force and fingerprint is not None and fingerprint == previous and outputs_exist:
+            print(f"[skip] {name}: inputs, code and parameters unchanged")
+            skipped.append(name)
+            continue
+
+        stale.add(name)
+        if dry_run:
+            print(f"[would run] {name}")
+            continue
+
+        print(f"\n[run] {name}")
+        stage_start = time.perf_counter()
+        importlib.import_module(stage['module']).main(**stage['params'])
+        state['stages'][name] = {
+            'fingerprint': fingerprint,
+            'seconds': round(time.perf_counter() - stage_start, 3),
+        }
+        save_state(state, state_file)
+        ran.append(name)
+
+    if not dry_run:
+        # Digests of files read this run are cached even when every stage was skipped
+        save_state(state, state_file)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    print(f"\nPipeline finished in {elapsed_ms:.1f} ms: {len(ran)} stage(s) ran, {len(skipped)} skipped.")
+    return ran, skipped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the data preparation stages, skipping those that are up to date.")
+    parser.add_argument('--force', action='store_true', help="Run every stage even if nothing changed.")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages would run.")
+    args = parser.parse_args()
+    run(force=args.force, dry_run=args.dry_run)
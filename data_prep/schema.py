@@ -0,0 +1,46 @@
+import numpy as np
+
+# --- Configuration ---
+COMPACT_SCHEMA = False  # Year as int16, names as categoricals, values as float32 where precision allows
+YEAR_DTYPE = np.int16
+FLOAT32_RTOL = 1e-6  # Largest relative error accepted when narrowing values to float32
+COUNTRY_COLUMN = 'Country ISO3'
+ID_COLUMNS = [COUNTRY_COLUMN, 'Year']
+
+
+def float32_fits(values):
+    """Per column, whether every value survives a float32 round-trip within FLOAT32_RTOL."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(over='ignore', invalid='ignore'):
+        narrowed = values.astype(np.float32).astype(np.float64)
+        ok = np.isnan(values) | (np.abs(narrowed - values) <= FLOAT32_RTOL * np.abs(values))
+    return ok.all(axis=0)
+
+
+def compact_wide(df):
+    """Compact dtypes for a wide (Country ISO3, Year) x Indicator frame."""
+    dtypes = {'Year': YEAR_DTYPE}
+    if COUNTRY_COLUMN in df.columns:
+        dtypes[COUNTRY_COLUMN] = 'category'
+
+    value_columns = [col for col in df.columns if col not in ID_COLUMNS]
+    fits = float32_fits(df[value_columns].to_numpy(dtype=np.float64))
+    dtypes.update({col: np.float32 for col, ok in zip(value_columns, fits) if ok})
+    return df.astype(dtypes)
+
+
+def compact_long(df):
+    """Compact dtypes for a long (Country ISO3, Year, Indicator, Value) frame."""
+    dtypes = {'Year': YEAR_DTYPE, 'Indicator': 'category'}
+    if COUNTRY_COLUMN in df.columns:
+        dtypes[COUNTRY_COLUMN] = 'category'
+    if float32_fits(df['Value'].to_numpy(dtype=np.float64)):
+        dtypes['Value'] = np.float32
+    return df.astype(dtypes)
+
+
+def memory_report(stage, df):
+    """Print and return the memory held by a frame, including the strings of object columns."""
+    megabytes = df.memory_usage(deep=True).sum() / 2**20
+    print(f"[memory] {stage}: {megabytes:.2f} MB for {df.shape[0]} rows x {df.shape[1]} columns")
+    return megabytes
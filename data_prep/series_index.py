@@ -0,0 +1,145 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_prep.long_store import CSV_FILE, STORE_DIR, MANIFEST_FILE, COUNTRY_COLUMN, open_columns, partitions, store_exists
+from data_prep.schema import COMPACT_SCHEMA, YEAR_DTYPE, compact_long
+
+# --- Configuration ---
+CACHE_SIZE = 256  # Series kept in the LRU of each index
+
+
+class SeriesIndex:
+    """
+    Maps (indicator, country) to a contiguous, Year-sorted row range of the long
+    table. series() returns read-only NumPy views into the table's columns, so no
+    rows are copied or scanned after the index is built.
+
+    `columns` is a list of (years, values) array pairs, one per partition, and
+    `ranges` maps each key to (partition, start, stop).
+    """
+
+    def __init__(self, columns, ranges, cache_size=CACHE_SIZE):
+        self.columns = columns
+        self.ranges = ranges
+        self.indicators = tuple(sorted({indicator for indicator, _ in ranges}))
+        self.countries = tuple(sorted({country for _, country in ranges if country is not None}))
+        # With a single country (or none recorded), series() does not need to be told which
+        self.default_country = self.countries[0] if len(self.countries) == 1 else None
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    @classmethod
+    def from_store(cls, store_dir=STORE_DIR, cache_size=CACHE_SIZE):
+        """Index a columnar store; its rows are already grouped and sorted, so this only reads the manifests."""
+        columns, ranges = [], {}
+        for part, (country, (part_dir, manifest)) in enumerate(partitions(store_dir).items()):
+            part_columns = open_columns(part_dir, manifest)
+            columns.append((part_columns['Year'], part_columns['Value']))
+            for indicator, (start, stop) in manifest['ranges'].items():
+                ranges[(indicator, country)] = (part, start, stop)
+        return cls(columns, ranges, cache_size)
+
+    @classmethod
+    def from_frame(cls, df_long, cache_size=CACHE_SIZE):
+        """Sort a long frame once by (country, indicator, year) and record where each group starts and stops."""
+        indicator = df_long['Indicator'].astype('category')
+        indicator_codes = indicator.cat.codes.to_numpy()
+        years = df_long['Year'].to_numpy()
+
+        if COUNTRY_COLUMN in df_long.columns:
+            country = df_long[COUNTRY_COLUMN].astype('category')
+            country_codes = country.cat.codes.to_numpy()
+            country_names = list(country.cat.categories)
+        else:
+            country_codes = np.zeros(len(df_long), dtype=np.int8)
+            country_names = [None]
+
+        order = np.lexsort((years, indicator_codes, country_codes))
+        indicator_codes = indicator_codes[order]
+        country_codes = country_codes[order]
+
+        # A group starts wherever the (country, indicator) pair changes
+        change = np.ones(len(order), dtype=bool)
+        if len(order):
+            change[1:] = (indicator_codes[1:] != indicator_codes[:-1]) | (country_codes[1:] != country_codes[:-1])
+        starts = np.flatnonzero(change)
+        stops = np.append(starts[1:], len(order))
+
+        categories = indicator.cat.categories
+        ranges = {
+            (str(categories[indicator_codes[start]]), country_names[country_codes[start]]): (0, int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        }
+        return cls([(years[order], df_long['Value'].to_numpy()[order])], ranges, cache_size)
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __contains__(self, key):
+        return key in self.ranges
+
+    def keys(self):
+        return self.ranges.keys()
+
+    def _key(self, indicator, country):
+        return (indicator, country if country is not None else self.default_country)
+
+    def series(self, indicator, country=None):
+        """(years, values) for one series, as read-only views. Raises KeyError for an unknown series."""
+        key = self._key(indicator, country)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        part, start, stop = self.ranges[key]
+        part_years, part_values = self.columns[part]
+        years = part_years[start:stop].view()
+        values = part_values[start:stop].view()
+        years.flags.writeable = False
+        values.flags.writeable = False
+
+        self._cache[key] = (years, values)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return years, values
+
+    def frame(self, indicator, country=None):
+        """One series as a Year, Indicator, Value frame; empty for an unknown series, like long_store.load_indicator()."""
+        if self._key(indicator, country) not in self.ranges:
+            return pd.DataFrame({'Year': np.empty(0, YEAR_DTYPE), 'Indicator': [], 'Value': np.empty(0)})
+        years, values = self.series(indicator, country)
+        return pd.DataFrame({'Year': years, 'Indicator': indicator, 'Value': values})
+
+
+_OPEN_INDEXES = {}
+
+
+def open_index(store_dir=STORE_DIR, csv_file=CSV_FILE, cache_size=CACHE_SIZE):
+    """
+    Shared index over the store (or the long CSV when there is no store). Reopened
+    only when the underlying file changes, so repeated calls in a process are free.
+    """
+    if store_exists(store_dir):
+        source = os.path.join(store_dir, MANIFEST_FILE)
+    else:
+        source = csv_file
+    stat = os.stat(source)
+    key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size, cache_size)
+
+    index = _OPEN_INDEXES.get(key)
+    if index is None:
+        if source == csv_file:
+            df_long = pd.read_csv(csv_file)
+            index = SeriesIndex.from_frame(compact_long(df_long) if COMPACT_SCHEMA else df_long, cache_size)
+        else:
+            index = SeriesIndex.from_store(store_dir, cache_size)
+        _OPEN_INDEXES[key] = index
+    return index
@@ -3,24 +3,37 @@ import pandas as pd
 from prophet import Prophet
 import matplotlib.pyplot as plt
 import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_prep.long_store import load_indicator
+from data_prep.prepare import prepare_indicator
+from custom_forecasting_model.prophet_warm_start import fit_prophet, load_previous, log_fit
 
 # --- Configuration ---
 INPUT_FILE = os.path.join('data', 'processed_energy_data_long.csv')
+INPUT_STORE_DIR = os.path.join('data', 'processed_energy_data_long')
+DATA_SOURCE = 'store'  # 'prepare' rebuilds the data in memory from resources/ without touching data/
+COUNTRY = 'PHL'  # Country ISO3 code of the series to forecast
 INDICATOR_TO_FORECAST = 'Access to electricity (% of population)'
 FORECAST_PERIOD_YEARS = 10
 OUTPUT_PLOT_FILE = 'electricity_access_forecast.png'
+MODEL_FILE = 'electricity_access_prophet_model.pkl'
+FIT_LOG_FILE = 'electricity_access_fit_log.jsonl'
+WARM_START = True  # Seed the optimizer with the parameters of the previously saved MODEL_FILE
 
 # --- Load and Prepare Data ---
-print(f"Loading data from {INPUT_FILE}...")
+print(f"Loading data for the indicator: {INDICATOR_TO_FORECAST}")
 try:
-    df_long = pd.read_csv(INPUT_FILE)
+    if DATA_SOURCE == 'prepare':
+        df_indicator = prepare_indicator(INDICATOR_TO_FORECAST, COUNTRY)
+    else:
+        df_indicator = load_indicator(INDICATOR_TO_FORECAST, INPUT_STORE_DIR, INPUT_FILE, COUNTRY)
 except FileNotFoundError:
     print(f"Error: The file {INPUT_FILE} was not found. Please make sure you have run the previous scripts.")
     exit()
 
-print("Filtering data for the indicator:", INDICATOR_TO_FORECAST)
-df_indicator = df_long[df_long['Indicator'] == INDICATOR_TO_FORECAST]
-
 # Prepare data for Prophet
 df_prophet = df_indicator[['Year', 'Value']].copy()
 df_prophet.rename(columns={'Year': 'ds', 'Value': 'y'}, inplace=True)
@@ -32,7 +45,14 @@ print(df_prophet.head())
 # --- Train the Prophet Model ---
 print("\n--- Training the Prophet model ---")
 model = Prophet()
-model.fit(df_prophet)
+previous = load_previous(MODEL_FILE) if WARM_START else None
+fit_stats = fit_prophet(model, df_prophet, previous)
+log_fit(fit_stats, INDICATOR_TO_FORECAST, FIT_LOG_FILE)
+print(f"{'Warm' if fit_stats['warm_start'] else 'Cold'} fit: "
+      f"{fit_stats['iterations']} iterations in {fit_stats['seconds']:.3f}s")
+
+with open(MODEL_FILE, 'wb') as f:
+    pickle.dump(model, f)
 
 # --- Make Future Predictions ---
 print(f"\n--- Making a {FORECAST_PERIOD_YEARS}-year forecast ---")